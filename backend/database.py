@@ -4,25 +4,53 @@ Simplified setup with SQLite for easy demonstration
 """
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 # Use SQLite for MVP demonstration (easier setup, no PostgreSQL required)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sol_os_mvp.db")
 
 # Create engine
 if DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration
+    # SQLite configuration - keep a small pool of connections open instead of
+    # reopening the database file for every session
     engine = create_engine(
         DATABASE_URL, 
-        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=20,
+        max_overflow=20,  # 40 total = FastAPI's threadpool size, so no thread waits on checkout
+        pool_pre_ping=False,  # Local file, a dead connection is not a concern
+        connect_args={"check_same_thread": False, "timeout": 30},
+        echo=os.getenv("DEBUG", "false").lower() == "true"
+    )
+    
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Tune each new SQLite connection for concurrent reads and fewer fsyncs"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped I/O
+        cursor.close()
+elif os.getenv("PGBOUNCER", "false").lower() == "true":
+    # PostgreSQL behind PgBouncer - let the bouncer own connection pooling
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
         echo=os.getenv("DEBUG", "false").lower() == "true"
     )
 else:
     # PostgreSQL configuration for production
     engine = create_engine(
         DATABASE_URL,
+        pool_size=20,
+        max_overflow=20,  # 40 total = FastAPI's threadpool size, so no thread waits on checkout
+        pool_recycle=3600,  # Replace connections before server-side idle timeouts
+        pool_pre_ping=True,  # Detect connections dropped by the network or server
         echo=os.getenv("DEBUG", "false").lower() == "true"
     )
 
@@ -3,18 +3,24 @@ Google Calendar Integration Service
 OAuth 2.0 authentication and two-way sync functionality
 """
 
-import json
+import asyncio
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Tuple
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
-from database import get_db
+# Google client libraries are heavy to import, so they are loaded inside the
+# methods that use them rather than on every cold start
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+from database import SessionLocal
 from models import User, TimeBlock
 from security import DataEncryptionService
 from config import settings
@@ -29,26 +35,73 @@ class GoogleCalendarService:
         'https://www.googleapis.com/auth/calendar.events'
     ]
     
+    # Maximum number of per-user Calendar API clients kept warm
+    SERVICE_CACHE_SIZE = 512
+    
+    # Stop serving cached credentials this many seconds before they expire
+    CREDENTIALS_EXPIRY_BUFFER_SECONDS = 300
+    
+    # Maximum concurrent batch requests when creating events in bulk
+    BULK_CONCURRENCY = 10
+    
+    # Google allows at most 50 calls per batch request
+    BATCH_SIZE = 50
+    
+    # How long a user's generated authorization URL is reused for /connect
+    AUTH_URL_TTL_SECONDS = 600
+    
     def __init__(self):
         self.encryption_service = DataEncryptionService()
+        self._services = OrderedDict()  # user_id -> (access_token, service)
+        self._credentials_cache = {}  # user_id -> (credentials, monotonic deadline)
+        self._credentials_lock = threading.Lock()
+        self._shared_http = None  # keep-alive transport shared by all cached clients
+        self._discovery_doc = None  # Calendar v3 discovery JSON, loaded on first use
+        self._auth_urls = TTLCache(maxsize=10000, ttl=self.AUTH_URL_TTL_SECONDS)  # user_id -> URL
+        self._auth_urls_lock = threading.Lock()
+        
+        # Blocking Google API work runs on one dedicated thread so it never stalls
+        # the event loop, and the shared transport is only ever used by that thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="google-calendar")
+        
+        # OAuth configuration never changes at runtime, so build it once
+        self._redirect_uri = f"{settings.FRONTEND_URL}/auth/google/callback"
         self.client_config = {
             "web": {
                 "client_id": settings.GOOGLE_CLIENT_ID,
                 "client_secret": settings.GOOGLE_CLIENT_SECRET,
                 "auth_uri": "https://accounts.google.com/o/oauth2/auth",
                 "token_uri": "https://oauth2.googleapis.com/token",
-                "redirect_uris": [f"{settings.FRONTEND_URL}/auth/google/callback"]
+                "redirect_uris": [self._redirect_uri]
             }
         }
     
+    async def run_blocking(self, func, *args):
+        """Run a blocking service method on the Google API thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    def _new_flow(self):
+        """Create an OAuth flow from the prebuilt client config"""
+        from google_auth_oauthlib.flow import Flow
+        
+        return Flow.from_client_config(
+            self.client_config,
+            scopes=self.SCOPES,
+            redirect_uri=self._redirect_uri
+        )
+    
     def get_authorization_url(self, user_id: str) -> str:
         """Generate OAuth 2.0 authorization URL"""
+        # The state is the user id, so a user's URL only changes when it is
+        # rebuilt; repeat clicks on /connect reuse it without a new flow
+        with self._auth_urls_lock:
+            cached = self._auth_urls.get(user_id)
+        if cached:
+            return cached
+        
         try:
-            flow = Flow.from_client_config(
-                self.client_config,
-                scopes=self.SCOPES,
-                redirect_uri=f"{settings.FRONTEND_URL}/auth/google/callback"
-            )
+            flow = self._new_flow()
             flow.state = user_id  # Pass user_id in state for callback
             
             authorization_url, _ = flow.authorization_url(
@@ -57,9 +110,11 @@ class GoogleCalendarService:
                 prompt='consent'  # Force consent to get refresh token
             )
             
+            with self._auth_urls_lock:
+                self._auth_urls[user_id] = authorization_url
             return authorization_url
         except Exception as e:
-            logger.error(f"Error generating authorization URL: {str(e)}")
+            logger.error("Error generating authorization URL: %s", e)
             raise
     
     def handle_oauth_callback(self, code: str, state: str, db: Session) -> bool:
@@ -68,14 +123,10 @@ class GoogleCalendarService:
             user_id = state
             user = db.query(User).filter(User.id == user_id).first()
             if not user:
-                logger.error(f"User not found for OAuth callback: {user_id}")
+                logger.error("User not found for OAuth callback: %s", user_id)
                 return False
             
-            flow = Flow.from_client_config(
-                self.client_config,
-                scopes=self.SCOPES,
-                redirect_uri=f"{settings.FRONTEND_URL}/auth/google/callback"
-            )
+            flow = self._new_flow()
             
             # Exchange authorization code for tokens
             flow.fetch_token(code=code)
@@ -101,63 +152,132 @@ class GoogleCalendarService:
             user.updated_at = datetime.utcnow()
             
             db.commit()
+            self._credentials_cache.pop(user_id, None)
             
-            logger.info(f"Google Calendar connected for user {user_id}")
+            logger.info("Google Calendar connected for user %s", user_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error handling OAuth callback: {str(e)}")
+            logger.error("Error handling OAuth callback: %s", e)
             db.rollback()
             return False
     
-    def get_credentials(self, user: User) -> Optional[Credentials]:
+    def get_credentials(self, user: User, db: Session) -> Optional["Credentials"]:
         """Get valid Google credentials for user"""
         try:
             if not user.google_calendar_connected:
                 return None
             
-            # Decrypt tokens
-            access_token = self.encryption_service.decrypt_text(
-                user.id,
-                user.encryption_salt,
-                user.google_calendar_access_token
-            )
-            
-            refresh_token = self.encryption_service.decrypt_text(
-                user.id,
-                user.encryption_salt,
-                user.google_calendar_refresh_token
-            ) if user.google_calendar_refresh_token else None
-            
-            # Create credentials object
-            credentials = Credentials(
-                token=access_token,
-                refresh_token=refresh_token,
-                token_uri="https://oauth2.googleapis.com/token",
-                client_id=settings.GOOGLE_CLIENT_ID,
-                client_secret=settings.GOOGLE_CLIENT_SECRET,
-                expiry=user.google_calendar_token_expires_at
-            )
+            # Serve live credentials from memory until they near expiry
+            cached = self._credentials_cache.get(user.id)
+            if cached and time.monotonic() < cached[1]:
+                return cached[0]
             
-            # Refresh if needed
-            if credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
+            with self._credentials_lock:
+                # Another caller may have refreshed while we waited
+                cached = self._credentials_cache.get(user.id)
+                if cached and time.monotonic() < cached[1]:
+                    return cached[0]
                 
-                # Update stored tokens
-                db = next(get_db())
-                user.google_calendar_access_token = self.encryption_service.encrypt_text(
-                    user.id,
-                    user.encryption_salt,
-                    credentials.token
-                )
-                user.google_calendar_token_expires_at = credentials.expiry
-                db.commit()
-            
-            return credentials
+                credentials = self._load_credentials(user, db)
+                self._cache_credentials(user.id, credentials)
+                return credentials
             
         except Exception as e:
-            logger.error(f"Error getting credentials: {str(e)}")
+            logger.error("Error getting credentials: %s", e)
+            return None
+    
+    def _load_credentials(self, user: User, db: Session) -> "Credentials":
+        """Decrypt stored tokens and refresh them with Google if expired"""
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        
+        # Decrypt tokens
+        access_token = self.encryption_service.decrypt_text(
+            user.id,
+            user.encryption_salt,
+            user.google_calendar_access_token
+        )
+        
+        refresh_token = self.encryption_service.decrypt_text(
+            user.id,
+            user.encryption_salt,
+            user.google_calendar_refresh_token
+        ) if user.google_calendar_refresh_token else None
+        
+        # Create credentials object
+        credentials = Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=settings.GOOGLE_CLIENT_ID,
+            client_secret=settings.GOOGLE_CLIENT_SECRET,
+            expiry=user.google_calendar_token_expires_at
+        )
+        
+        # Refresh if needed
+        if credentials.expired and credentials.refresh_token:
+            credentials.refresh(Request())
+            
+            # Update stored tokens on the caller's session
+            user.google_calendar_access_token = self.encryption_service.encrypt_text(
+                user.id,
+                user.encryption_salt,
+                credentials.token
+            )
+            user.google_calendar_token_expires_at = credentials.expiry
+            db.merge(user)
+            db.commit()
+        
+        return credentials
+    
+    def _cache_credentials(self, user_id: str, credentials: "Credentials"):
+        """Keep credentials in memory until shortly before their expiry"""
+        if not credentials.expiry:
+            return
+        
+        ttl = (credentials.expiry - datetime.utcnow()).total_seconds() - self.CREDENTIALS_EXPIRY_BUFFER_SECONDS
+        if ttl > 0:
+            self._credentials_cache[user_id] = (credentials, time.monotonic() + ttl)
+    
+    def _service_for(self, user: User, db: Session):
+        """Get a Calendar API client for user, rebuilt only when the access token rotates"""
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.http import build_http
+        
+        credentials = self.get_credentials(user, db)
+        if not credentials:
             return None
+        
+        cached = self._services.get(user.id)
+        if cached and cached[0] == credentials.token:
+            self._services.move_to_end(user.id)
+            return cached[1]
+        
+        # All clients share one httplib2 connection pool so the TLS connection to
+        # googleapis.com is reused across users. Requests are issued from the
+        # Google API thread; bulk operations use their own transports.
+        if self._shared_http is None:
+            self._shared_http = build_http()
+        
+        service = build_from_document(
+            self._discovery_document(),
+            http=AuthorizedHttp(credentials, http=self._shared_http)
+        )
+        self._services[user.id] = (credentials.token, service)
+        if len(self._services) > self.SERVICE_CACHE_SIZE:
+            self._services.popitem(last=False)
+        
+        return service
+    
+    def _discovery_document(self) -> str:
+        """Calendar v3 discovery document, read once from the copy bundled with googleapiclient"""
+        from googleapiclient.discovery_cache import get_static_doc
+        
+        if self._discovery_doc is None:
+            self._discovery_doc = get_static_doc('calendar', 'v3')
+        return self._discovery_doc
     
     def disconnect_calendar(self, user_id: str, db: Session) -> bool:
         """Disconnect Google Calendar for user"""
@@ -167,9 +287,13 @@ class GoogleCalendarService:
                 return False
             
             # Clear OAuth data
+            self._services.pop(user_id, None)
+            self._credentials_cache.pop(user_id, None)
             user.google_calendar_access_token = None
             user.google_calendar_refresh_token = None
             user.google_calendar_token_expires_at = None
+            user.google_calendar_sync_token = None
+            user.google_calendar_events_etag = None
             user.google_calendar_connected = False
             user.google_calendar_sync_enabled = False
             user.updated_at = datetime.utcnow()
@@ -182,121 +306,223 @@ class GoogleCalendarService:
                 block.sync_status = 'disconnected'
             
             db.commit()
-            logger.info(f"Google Calendar disconnected for user {user_id}")
+            logger.info("Google Calendar disconnected for user %s", user_id)
             return True
             
         except Exception as e:
-            logger.error(f"Error disconnecting calendar: {str(e)}")
+            logger.error("Error disconnecting calendar: %s", e)
             db.rollback()
             return False
     
-    def create_google_event(self, user: User, time_block: TimeBlock) -> Optional[str]:
+    def create_google_event(self, user: User, time_block: TimeBlock, db: Session) -> Optional[str]:
         """Create event in Google Calendar"""
+        from googleapiclient.errors import HttpError
+        
         try:
-            credentials = self.get_credentials(user)
-            if not credentials:
+            service = self._service_for(user, db)
+            if not service:
                 return None
             
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            # Prepare event data
-            event = {
-                'summary': time_block.title,
-                'description': time_block.description or '',
-                'location': time_block.location or '',
-                'start': {
-                    'dateTime': time_block.start_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': time_block.end_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-            }
-            
-            if time_block.all_day:
-                event['start'] = {
-                    'date': time_block.start_time.date().isoformat(),
-                }
-                event['end'] = {
-                    'date': time_block.end_time.date().isoformat(),
-                }
-            
             # Create event
             created_event = service.events().insert(
                 calendarId='primary',
-                body=event
+                body=self._build_event_body(time_block)
             ).execute()
             
             return created_event['id']
             
         except HttpError as e:
-            logger.error(f"Google Calendar API error: {e}")
+            logger.error("Google Calendar API error: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error creating Google event: {str(e)}")
+            logger.error("Error creating Google event: %s", e)
             return None
     
-    def update_google_event(self, user: User, time_block: TimeBlock) -> bool:
+    def push_time_block(self, user_id: str, time_block_id: str) -> None:
+        """Create or update one block's Google event and record the outcome
+        
+        Runs after the API response on its own session, so it reloads both
+        rows and commits the sync status itself.
+        """
+        with SessionLocal() as db:
+            user = db.get(User, user_id)
+            time_block = db.get(TimeBlock, time_block_id)
+            if not user or not time_block or time_block.user_id != user_id:
+                return
+            
+            if time_block.google_calendar_event_id:
+                success = self.update_google_event(user, time_block, db)
+            else:
+                event_id = self.create_google_event(user, time_block, db)
+                if event_id:
+                    time_block.google_calendar_event_id = event_id
+                success = bool(event_id)
+            
+            if success:
+                time_block.sync_status = 'synced'
+                time_block.last_synced_at = datetime.utcnow()
+                time_block.sync_error = None
+            else:
+                time_block.sync_status = 'error'
+                time_block.sync_error = 'Failed to sync to Google Calendar'
+            db.commit()
+    
+    async def push_time_block_in_background(self, user_id: str, time_block_id: str):
+        """push_time_block on the Google API thread, for use as a background task"""
+        await self.run_blocking(self.push_time_block, user_id, time_block_id)
+    
+    async def create_events_bulk(
+        self,
+        user: User,
+        time_blocks: List[TimeBlock],
+        db: Session
+    ) -> Dict[str, Optional[str]]:
+        """Create many events in Google Calendar concurrently
+        
+        Inserts are grouped into batch requests, and the batches run in
+        parallel. Returns a mapping of time block id to the created event
+        id, or None for blocks that failed to sync.
+        """
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.http import build_http
+        
+        credentials = await self.run_blocking(self.get_credentials, user, db)
+        service = await self.run_blocking(self._service_for, user, db)
+        if not credentials or not service:
+            return {block.id: None for block in time_blocks}
+        
+        semaphore = asyncio.Semaphore(self.BULK_CONCURRENCY)
+        
+        def execute_batch(ops: List[Tuple[str, TimeBlock]]) -> Dict[str, Any]:
+            # httplib2 connections are not thread-safe, so each batch gets its own
+            http = AuthorizedHttp(credentials, http=build_http())
+            return self._execute_batch(service, ops, http=http)
+        
+        async def run_batch(ops: List[Tuple[str, TimeBlock]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await asyncio.to_thread(execute_batch, ops)
+        
+        ops = [('insert', block) for block in time_blocks]
+        batches = [ops[i:i + self.BATCH_SIZE] for i in range(0, len(ops), self.BATCH_SIZE)]
+        
+        results = {}
+        for batch_results in await asyncio.gather(*(run_batch(batch) for batch in batches)):
+            results.update(batch_results)
+        return results
+    
+    def push_many(self, user: User, ops: List[Tuple[str, TimeBlock]], db: Session) -> Dict[str, Any]:
+        """Send event inserts, updates and deletes as batched HTTP requests
+        
+        `ops` is a list of ('insert' | 'update' | 'delete', time_block) pairs.
+        Returns a mapping of time block id to the Google event id for inserts
+        and updates, True for deletes, or None when the operation failed.
+        """
+        service = self._service_for(user, db)
+        if not service:
+            return {block.id: None for _, block in ops}
+        
+        results = {}
+        for i in range(0, len(ops), self.BATCH_SIZE):
+            results.update(self._execute_batch(service, ops[i:i + self.BATCH_SIZE]))
+        return results
+    
+    def _execute_batch(self, service, ops: List[Tuple[str, TimeBlock]], http=None) -> Dict[str, Any]:
+        """Run up to BATCH_SIZE event operations in a single HTTP request"""
+        results = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                logger.error("Google Calendar batch error for block %s: %s", request_id, exception)
+                results[request_id] = None
+            else:
+                results[request_id] = response.get('id', True) if response else True
+        
+        batch = service.new_batch_http_request(callback=on_response)
+        for op, time_block in ops:
+            if op == 'insert':
+                request = service.events().insert(
+                    calendarId='primary',
+                    body=self._build_event_body(time_block)
+                )
+            elif op == 'update':
+                request = service.events().update(
+                    calendarId='primary',
+                    eventId=time_block.google_calendar_event_id,
+                    body=self._build_event_body(time_block)
+                )
+            elif op == 'delete':
+                request = service.events().delete(
+                    calendarId='primary',
+                    eventId=time_block.google_calendar_event_id
+                )
+            else:
+                raise ValueError(f"Unknown event operation: {op}")
+            batch.add(request, request_id=time_block.id)
+        
+        try:
+            batch.execute(http=http)
+        except Exception as e:
+            logger.error("Error executing Google Calendar batch: %s", e)
+        
+        for _, time_block in ops:
+            results.setdefault(time_block.id, None)
+        return results
+    
+    @staticmethod
+    def _build_event_body(time_block: TimeBlock) -> Dict[str, Any]:
+        """Build Google Calendar event payload for a time block"""
+        if time_block.all_day:
+            start = {'date': time_block.start_time.date().isoformat()}
+            end = {'date': time_block.end_time.date().isoformat()}
+        else:
+            start = {'dateTime': time_block.start_time.isoformat(timespec='seconds'), 'timeZone': 'UTC'}
+            end = {'dateTime': time_block.end_time.isoformat(timespec='seconds'), 'timeZone': 'UTC'}
+        
+        return {
+            'summary': time_block.title,
+            'description': time_block.description or '',
+            'location': time_block.location or '',
+            'start': start,
+            'end': end,
+        }
+    
+    def update_google_event(self, user: User, time_block: TimeBlock, db: Session) -> bool:
         """Update event in Google Calendar"""
+        from googleapiclient.errors import HttpError
+        
         try:
             if not time_block.google_calendar_event_id:
                 return False
             
-            credentials = self.get_credentials(user)
-            if not credentials:
+            service = self._service_for(user, db)
+            if not service:
                 return False
             
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            # Prepare event data
-            event = {
-                'summary': time_block.title,
-                'description': time_block.description or '',
-                'location': time_block.location or '',
-                'start': {
-                    'dateTime': time_block.start_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': time_block.end_time.isoformat(),
-                    'timeZone': 'UTC',
-                },
-            }
-            
-            if time_block.all_day:
-                event['start'] = {
-                    'date': time_block.start_time.date().isoformat(),
-                }
-                event['end'] = {
-                    'date': time_block.end_time.date().isoformat(),
-                }
-            
             # Update event
             service.events().update(
                 calendarId='primary',
                 eventId=time_block.google_calendar_event_id,
-                body=event
+                body=self._build_event_body(time_block)
             ).execute()
             
             return True
             
         except HttpError as e:
-            logger.error(f"Google Calendar API error: {e}")
+            logger.error("Google Calendar API error: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Error updating Google event: {str(e)}")
+            logger.error("Error updating Google event: %s", e)
             return False
     
-    def delete_google_event(self, user: User, event_id: str) -> bool:
+    def delete_google_event(self, user: User, event_id: str, db: Session) -> bool:
         """Delete event from Google Calendar"""
+        from googleapiclient.errors import HttpError
+        
         try:
-            credentials = self.get_credentials(user)
-            if not credentials:
+            service = self._service_for(user, db)
+            if not service:
                 return False
             
-            service = build('calendar', 'v3', credentials=credentials)
-            
             service.events().delete(
                 calendarId='primary',
                 eventId=event_id
@@ -305,64 +531,151 @@ class GoogleCalendarService:
             return True
             
         except HttpError as e:
-            logger.error(f"Google Calendar API error: {e}")
+            logger.error("Google Calendar API error: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Error deleting Google event: {str(e)}")
+            logger.error("Error deleting Google event: %s", e)
             return False
     
     def sync_from_google(self, user: User, db: Session, days_ahead: int = 30) -> bool:
-        """Sync events from Google Calendar to Sol OS"""
+        """Sync events from Google Calendar to Sol OS
+        
+        The first sync lists the next `days_ahead` days; later syncs use the
+        stored sync token so Google only returns events changed since then.
+        """
+        from googleapiclient.errors import HttpError
+        
         try:
-            credentials = self.get_credentials(user)
-            if not credentials:
+            service = self._service_for(user, db)
+            if not service:
                 return False
             
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            # Get events from next 30 days
             now = datetime.utcnow()
-            time_max = (now + timedelta(days=days_ahead)).isoformat() + 'Z'
+            events_result = None
+            if user.google_calendar_sync_token:
+                try:
+                    events_result = self._list_google_events(
+                        service,
+                        etag=user.google_calendar_events_etag,
+                        syncToken=user.google_calendar_sync_token,
+                        # Must match the full sync's query, or recurring
+                        # series come back as one master event
+                        singleEvents=True
+                    )
+                except HttpError as e:
+                    # 304 Not Modified - nothing changed since the last sync
+                    if e.resp.status == 304:
+                        return True
+                    # 410 Gone means the token expired - fall back to a full sync
+                    if e.resp.status != 410:
+                        raise
+                    logger.info("Sync token expired for user %s, running full sync", user.id)
+            
+            if events_result is None:
+                # Get events from next 30 days
+                time_max = (now + timedelta(days=days_ahead)).isoformat() + 'Z'
+                
+                events_result = self._list_google_events(
+                    service,
+                    timeMin=now.isoformat() + 'Z',
+                    timeMax=time_max,
+                    singleEvents=True
+                )
             
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=now.isoformat() + 'Z',
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            google_events, next_sync_token, events_etag = events_result
+            
+            # Deleted events only carry their id and a cancelled status
+            cancelled_ids = [g_event['id'] for g_event in google_events if g_event.get('status') == 'cancelled']
             
-            google_events = events_result.get('items', [])
+            # Skip events that were created by Sol OS
+            google_events = [
+                g_event for g_event in google_events
+                if g_event.get('status') != 'cancelled'
+                and not g_event.get('description', '').startswith('[Sol OS]')
+            ]
+            
+            if cancelled_ids:
+                db.query(TimeBlock).filter(
+                    TimeBlock.user_id == user.id,
+                    TimeBlock.google_calendar_event_id.in_(cancelled_ids)
+                ).delete(synchronize_session=False)
+            
+            # Load all already-synced blocks in one query
+            event_ids = [g_event['id'] for g_event in google_events]
+            existing_blocks = {
+                block.google_calendar_event_id: block
+                for block in db.query(TimeBlock).filter(
+                    TimeBlock.user_id == user.id,
+                    TimeBlock.google_calendar_event_id.in_(event_ids)
+                ).all()
+            } if event_ids else {}
             
             # Process each Google event
+            new_blocks = []
             for g_event in google_events:
-                # Skip if event was created by Sol OS
-                if g_event.get('description', '').startswith('[Sol OS]'):
-                    continue
-                
-                # Check if we already have this event
-                existing_block = db.query(TimeBlock).filter(
-                    TimeBlock.user_id == user.id,
-                    TimeBlock.google_calendar_event_id == g_event['id']
-                ).first()
-                
+                existing_block = existing_blocks.get(g_event['id'])
                 if existing_block:
                     # Update existing block
-                    self._update_time_block_from_google_event(existing_block, g_event)
+                    self._update_time_block_from_google_event(existing_block, g_event, now)
                 else:
                     # Create new block
-                    new_block = self._create_time_block_from_google_event(user.id, g_event)
-                    db.add(new_block)
+                    new_blocks.append(self._create_time_block_from_google_event(user.id, g_event, now))
+            
+            if new_blocks:
+                db.bulk_save_objects(new_blocks)
+            
+            # Remember where this sync ended for the next incremental sync
+            user.google_calendar_sync_token = next_sync_token
+            user.google_calendar_events_etag = events_etag
+            db.merge(user)
             
             db.commit()
             return True
             
         except Exception as e:
-            logger.error(f"Error syncing from Google: {str(e)}")
+            logger.error("Error syncing from Google: %s", e)
             db.rollback()
             return False
     
-    def _create_time_block_from_google_event(self, user_id: str, g_event: Dict[str, Any]) -> TimeBlock:
+    def _list_google_events(
+        self,
+        service,
+        etag: Optional[str] = None,
+        **params
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+        """List all pages of primary calendar events
+        
+        Returns the events, the next sync token and the ETag of the first page.
+        When `etag` is given it is sent as If-None-Match, so an unchanged
+        listing raises HttpError 304 instead of returning the full body.
+        """
+        events = []
+        page_token = None
+        first_page_etag = None
+        
+        while True:
+            request = service.events().list(
+                calendarId='primary',
+                pageToken=page_token,
+                **params
+            )
+            if etag and page_token is None:
+                request.headers['If-None-Match'] = etag
+            events_result = request.execute()
+            
+            if page_token is None:
+                first_page_etag = events_result.get('etag')
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events, events_result.get('nextSyncToken'), first_page_etag
+    
+    def _create_time_block_from_google_event(
+        self,
+        user_id: str,
+        g_event: Dict[str, Any],
+        now: datetime
+    ) -> TimeBlock:
         """Create TimeBlock from Google Calendar event"""
         start_time = self._parse_google_datetime(g_event['start'])
         end_time = self._parse_google_datetime(g_event['end'])
@@ -378,12 +691,12 @@ class GoogleCalendarService:
             google_calendar_event_id=g_event['id'],
             google_calendar_sync_enabled=True,
             sync_status='synced',
-            last_synced_at=datetime.utcnow(),
+            last_synced_at=now,
             block_type='external',
             color='#34D399'  # Green for external events
         )
     
-    def _update_time_block_from_google_event(self, time_block: TimeBlock, g_event: Dict[str, Any]):
+    def _update_time_block_from_google_event(self, time_block: TimeBlock, g_event: Dict[str, Any], now: datetime):
         """Update TimeBlock with data from Google Calendar event"""
         time_block.title = g_event.get('summary', 'Untitled Event')
         time_block.description = g_event.get('description', '')
@@ -392,17 +705,16 @@ class GoogleCalendarService:
         time_block.end_time = self._parse_google_datetime(g_event['end'])
         time_block.all_day = 'date' in g_event['start']
         time_block.sync_status = 'synced'
-        time_block.last_synced_at = datetime.utcnow()
+        time_block.last_synced_at = now
     
     def _parse_google_datetime(self, dt_info: Dict[str, str]) -> datetime:
         """Parse Google Calendar datetime format"""
         if 'dateTime' in dt_info:
-            # Regular event with time
-            dt_str = dt_info['dateTime']
-            # Remove timezone info and parse
-            if 'T' in dt_str:
-                dt_str = dt_str.split('T')[0] + 'T' + dt_str.split('T')[1].split('+')[0].split('-')[0].split('Z')[0]
-            return datetime.fromisoformat(dt_str.replace('Z', '+00:00')).replace(tzinfo=None)
+            # Regular event with time - RFC 3339, normalized to naive UTC
+            dt = datetime.fromisoformat(dt_info['dateTime'])
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+            return dt
         else:
             # All-day event
             return datetime.fromisoformat(dt_info['date']).replace(hour=9)  # Default to 9 AM
@@ -4,15 +4,27 @@ ADHD AI Companion with Security-First Architecture
 """
 
 import os
+import time
+import asyncio
+import random
+import anyio
 import secrets
+import queue
 import logging
+import logging.handlers
+import uuid
+import orjson
 import structlog
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -27,27 +39,41 @@ from security import (
     SecurityAuditService,
     ConsentManager,
     GDPRComplianceService,
+    TokenBucketRateLimiter,
+    RandomTokenPool,
+    CachedUser,
+    cache_user,
+    evict_cached_user,
+    get_cached_user,
     get_client_ip,
+    start_audit_writer,
+    stop_audit_writer,
     validate_password_strength
 )
+from schemas import ResourceIdPath
+from partitions import ensure_partitions, start_partition_maintenance_task, stop_partition_maintenance_task
 from sol_personality import (
     SolPersonalityEngine, 
     ConversationMemoryService,
-    ConversationContext
+    ConversationContext,
+    SolResponse,
+    start_conversation_writer,
+    stop_conversation_writer
 )
 from routers import calendar
 
+def orjson_renderer(_, __, event_dict: Dict[str, Any]) -> str:
+    """Render log events with orjson; stdlib handlers expect str, not bytes"""
+    return orjson.dumps(event_dict, default=repr).decode()
+
 # Configure structured logging
 structlog.configure(
     processors=[
         structlog.stdlib.filter_by_level,
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        orjson_renderer
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
@@ -55,38 +81,91 @@ structlog.configure(
     cache_logger_on_first_use=True,
 )
 
+# Request handlers only enqueue log records; a background thread does the writes
+log_queue: queue.Queue = queue.Queue(maxsize=10000)
+root_logger = logging.getLogger()
+root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+log_listener = logging.handlers.QueueListener(
+    log_queue, logging.StreamHandler(), respect_handler_level=True
+)
+log_listener.start()
+
 logger = structlog.get_logger()
 
+# Fraction of DEBUG log sites that actually emit when DEBUG is enabled
+DEBUG_LOG_SAMPLE_RATE = float(os.getenv("DEBUG_LOG_SAMPLE_RATE", "0.1"))
+
+def debug_sampled() -> bool:
+    """Whether this call site should emit a DEBUG log"""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_LOG_SAMPLE_RATE
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
 
+# Authenticated endpoints are limited per user rather than per client IP
+chat_rate_limiter = TokenBucketRateLimiter(requests_per_minute=30)
+
+# New chat session ids come from a pre-read random buffer
+session_id_pool = RandomTokenPool()
+
 # Initialize services
 app = FastAPI(
     title="Sol OS MVP - ADHD AI Companion",
     description="Security-first ADHD productivity companion with Sol's distinctive personality",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    body = await request.body()
-    logger.info(f"Incoming {request.method} {request.url.path} from {request.client.host if request.client else 'unknown'}")
-    if body:
-        logger.info(f"Request body: {body}")
-    
-    # Restore body for the next handler
-    async def receive():
-        return {"type": "http.request", "body": body}
-    
-    request._receive = receive
-    
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
-    return response
+class RequestLoggingMiddleware:
+    """
+    Log all incoming requests.
+    Plain ASGI middleware: the body streams through untouched unless a sampled
+    DEBUG log wants a copy of its first bytes.
+    """
+    
+    MAX_LOGGED_BODY_BYTES = 4096
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        log_info = logger.isEnabledFor(logging.INFO)
+        if log_info:
+            client = scope.get("client")
+            logger.info("incoming_request", method=scope["method"], path=scope["path"],
+                        client=client[0] if client else None)
+        
+        if debug_sampled():
+            body = bytearray()
+            receive_app = receive
+            
+            async def receive():
+                message = await receive_app()
+                if message["type"] == "http.request" and len(body) < self.MAX_LOGGED_BODY_BYTES:
+                    body.extend(message.get("body", b"")[:self.MAX_LOGGED_BODY_BYTES - len(body)])
+                    if body and not message.get("more_body", False):
+                        logger.debug("request_body", body=bytes(body))
+                return message
+        
+        async def send_wrapper(message):
+            if log_info and message["type"] == "http.response.start":
+                duration_ms = (time.perf_counter() - start) * 1000
+                logger.info("response_sent", method=scope["method"], path=scope["path"],
+                            status=message["status"], duration_ms=round(duration_ms, 1))
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+app.add_middleware(RequestLoggingMiddleware)
 
 # Add rate limiting
 app.state.limiter = limiter
@@ -105,12 +184,58 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
 app.include_router(calendar.router)
 
+@app.on_event("startup")
+async def start_partition_maintenance():
+    """Create monthly partitions before traffic arrives, then keep them rolling"""
+    if engine.dialect.name == "postgresql":
+        await asyncio.to_thread(ensure_partitions, engine)
+        start_partition_maintenance_task(engine)
+
+@app.on_event("startup")
+async def start_audit_batching():
+    """Write security audit events in batches instead of one commit each"""
+    start_audit_writer()
+
+@app.on_event("startup")
+async def start_conversation_batching():
+    """Write chat turns in batches instead of one commit each"""
+    start_conversation_writer()
+
+@app.on_event("shutdown")
+async def stop_partition_maintenance():
+    """Stop the daily partition maintenance loop"""
+    await stop_partition_maintenance_task()
+
+@app.on_event("shutdown")
+async def flush_conversations():
+    """Persist chat turns still waiting for a batch"""
+    await stop_conversation_writer()
+
+@app.on_event("shutdown")
+async def flush_audit_events():
+    """Persist audit events still waiting for a batch"""
+    await stop_audit_writer()
+
+@app.on_event("shutdown")
+async def close_openai_client():
+    """Close the personality engine's pooled OpenAI connections"""
+    await personality_engine.aclose()
+
+@app.on_event("shutdown")
+def flush_logs():
+    """Drain queued log records before the process exits"""
+    log_listener.stop()
+
 # Database dependency
+# Sessions are synchronous, so endpoints that only do database work are plain
+# `def` and run in FastAPI's threadpool instead of blocking the event loop.
+# Async endpoints hand their database work to run_in_threadpool.
 def get_db():
     db = SessionLocal()
     try:
@@ -186,23 +311,50 @@ class JournalEntryUpdate(BaseModel):
     emotional_tags: Optional[List[str]] = None
     is_favorite: Optional[bool] = None
 
+class JournalEntryResponse(BaseModel):
+    id: str
+    title: Optional[str]
+    content: Optional[str]
+    mood_rating: Optional[int]
+    energy_level: Optional[int]
+    focus_level: Optional[int]
+    anxiety_level: Optional[int]
+    accomplishments: Optional[str]
+    challenges: Optional[str]
+    gratitude: Optional[str]
+    tomorrow_focus: Optional[str]
+    emotional_tags: Optional[List[str]]
+    entry_date: datetime
+    is_favorite: Optional[bool]
+    created_at: datetime
+    updated_at: datetime
+
 # Dependency to get current user
-async def get_current_user(
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
+) -> CachedUser:
     """Get current authenticated user"""
     try:
         payload = auth_service.verify_token(credentials.credentials)
         user_id = payload.get("sub")
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        user = get_cached_user(user_id)
+        if user is not None:
+            return user
+        
+        row = db.query(
+            User.id, User.username, User.encryption_salt, User.is_active
+        ).filter(User.id == user_id).first()
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
         
+        user = CachedUser(*row, cipher=encryption_service.get_cipher(str(row.id), row.encryption_salt))
+        cache_user(user_id, user)
+        
         return user
     except Exception as e:
         raise HTTPException(
@@ -220,17 +372,19 @@ async def root():
         "focus": "ADHD productivity support with philosophical depth"
     }
 
+HEALTH_SERVICES = {
+    "database": "connected",
+    "personality_engine": "active",
+    "encryption": "enabled"
+}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "services": {
-            "database": "connected",
-            "personality_engine": "active",
-            "encryption": "enabled"
-        }
+        "services": HEALTH_SERVICES
     }
 
 # Authentication endpoints
@@ -239,76 +393,89 @@ async def health_check():
 async def register_user(request: Request, user_data: UserRegister, db: Session = Depends(get_db)):
     """Register new user with security-first approach"""
     
-    logger.info("User registration attempt", 
-                email_domain=user_data.email.split('@')[1], 
-                username=user_data.username,
-                ip_address=get_client_ip(request))
+    email_domain = user_data.email.partition('@')[2]
+    client_ip = get_client_ip(request)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("User registration attempt", 
+                    email_domain=email_domain, 
+                    username=user_data.username,
+                    ip_address=client_ip)
     
     # Validate password strength
     if not validate_password_strength(user_data.password):
         logger.warning("Registration failed - weak password", 
-                      email_domain=user_data.email.split('@')[1])
+                      email_domain=email_domain)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must be at least 8 characters with uppercase, lowercase, digit, and special character"
         )
     
-    # Check if user already exists
+    password_hash = await auth_service.hash_password_async(user_data.password)
+    user_id = await run_in_threadpool(create_user_record, db, user_data, password_hash, client_ip)
+    
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("User registration successful", 
+                    user_id=user_id,
+                    username=user_data.username)
+    
+    # Generate tokens
+    access_token = auth_service.create_access_token(user_id)
+    refresh_token = auth_service.create_refresh_token(user_id)
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user_id,
+            "username": user_data.username,
+            "email": user_data.email
+        }
+    }
+
+def create_user_record(db: Session, user_data: UserRegister, password_hash: str, client_ip: str) -> str:
+    """Insert a new user with an encrypted email and return its id"""
+    
     email_hash = encryption_service.hash_email_for_index(user_data.email)
-    existing_user = db.query(User).filter(User.email_hash == email_hash).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
     
-    # Check username
-    existing_username = db.query(User).filter(User.username == user_data.username).first()
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
+    # Accounts from before the keyed hash still carry the old SHA-256 value
+    # until their next login, which the unique index cannot see
+    legacy_email_hash = encryption_service.legacy_email_hash(user_data.email)
+    if db.query(User.id).filter(User.email_hash == legacy_email_hash).first():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     
-    # Create user with encryption
+    # Create user with encryption. The id is chosen here rather than by the
+    # column default so the email is encrypted under the user's real key
+    user_id = str(uuid.uuid4())
     user_salt = encryption_service.generate_user_salt()
-    encrypted_email = encryption_service.encrypt_text(
-        user_data.username,  # Use username as temporary user_id for encryption
-        user_salt,
-        user_data.email
-    )
+    encrypted_email = encryption_service.encrypt_text(user_id, user_salt, user_data.email)
     
     new_user = User(
+        id=user_id,
         email_hash=email_hash,
         email_encrypted=encrypted_email,
         username=user_data.username,
-        password_hash=auth_service.hash_password(user_data.password),
+        password_hash=password_hash,
         encryption_salt=user_salt,
-        created_by=get_client_ip(request)
+        created_by=client_ip
     )
     
+    # email_hash and username are uniquely indexed, so the insert itself is the
+    # duplicate check
     db.add(new_user)
+    try:
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if "email_hash" in str(e.orig):
+            detail = "Email already registered"
+        elif "username" in str(e.orig):
+            detail = "Username already taken"
+        else:
+            raise
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
     db.commit()
-    db.refresh(new_user)
-    
-    logger.info("User registration successful", 
-                user_id=str(new_user.id),
-                username=new_user.username)
-    
-    # Generate tokens
-    access_token = auth_service.create_access_token(str(new_user.id))
-    refresh_token = auth_service.create_refresh_token(str(new_user.id))
-    
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "user": {
-            "id": str(new_user.id),
-            "username": new_user.username,
-            "email": user_data.email
-        }
-    }
+    return user_id
 
 @app.post("/api/v1/auth/login")
 @limiter.limit("10/minute")  # Limit login attempts
@@ -316,19 +483,41 @@ async def login_user(request: Request, login_data: UserLogin, db: Session = Depe
     """Login user with security measures"""
     
     # Debug logging for frontend requests
+    log_debug = debug_sampled()
+    if log_debug:
+        logger.debug("login_attempt", ip_address=get_client_ip(request), email=login_data.email)
+    
+    # Hashed once; the lockout check, the lookup and the audit trail all key on it
+    email_hash = encryption_service.hash_email_for_index(login_data.email)
     client_ip = get_client_ip(request)
-    logger.info(f"Login attempt from {client_ip} - Email: {login_data.email}")
+    audit_service = SecurityAuditService(db)
+    
+    if await audit_service.check_failed_login_attempts(email_hash, client_ip):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later"
+        )
     
     # Find user
-    email_hash = encryption_service.hash_email_for_index(login_data.email)
-    user = db.query(User).filter(User.email_hash == email_hash).first()
+    legacy_email_hash = encryption_service.legacy_email_hash(login_data.email)
+    user = await run_in_threadpool(
+        db.query(User).filter(User.email_hash.in_((email_hash, legacy_email_hash))).first
+    )
     
     if not user:
-        logger.warning(f"User not found for email: {login_data.email}")
-    else:
-        logger.info(f"User found: {user.username}, checking password...")
-    
-    if not user or not auth_service.verify_password(login_data.password, user.password_hash):
+        logger.warning("login_user_not_found", email_domain=login_data.email.partition('@')[2])
+    elif log_debug:
+        logger.debug("login_user_found", username=user.username)
+    
+    if not user or not await auth_service.verify_password_async(login_data.password, user.password_hash):
+        await audit_service.log_security_event(
+            "login_failed",
+            user_id=str(user.id) if user else None,
+            ip_address=client_ip,
+            success=False,
+            risk_level="medium",
+            email_hash=email_hash
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -341,70 +530,81 @@ async def login_user(request: Request, login_data: UserLogin, db: Session = Depe
             detail="Account is deactivated"
         )
     
-    # Update last login
+    # Move bcrypt and outdated argon2 hashes to current parameters
+    if auth_service.password_needs_rehash(user.password_hash):
+        user.password_hash = await auth_service.hash_password_async(login_data.password)
+    
+    # Likewise move a legacy SHA-256 email index to the keyed hash
+    if not secrets.compare_digest(user.email_hash, email_hash):
+        user.email_hash = email_hash
+    
+    # Update last login - read what the response needs before commit expires it
+    user_id, username = str(user.id), user.username
     user.last_login = datetime.utcnow()
     user.failed_login_attempts = 0
-    db.commit()
+    await run_in_threadpool(db.commit)
+    evict_cached_user(user_id)
     
     # Generate tokens
-    access_token = auth_service.create_access_token(str(user.id))
-    refresh_token = auth_service.create_refresh_token(str(user.id))
+    access_token = auth_service.create_access_token(user_id)
+    refresh_token = auth_service.create_refresh_token(user_id)
     
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": {
-            "id": str(user.id),
-            "username": user.username
+            "id": user_id,
+            "username": username
         }
     }
 
+async def rate_limit_chat(current_user: CachedUser = Depends(get_current_user)):
+    """Reasonable chat limits"""
+    # Shares get_current_user with the endpoint via FastAPI's per-request cache
+    if not chat_rate_limiter.allow(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded: 30 per 1 minute"
+        )
+
 # Chat endpoint - Core Sol companion functionality
-@app.post("/api/v1/chat")
-@limiter.limit("30/minute")  # Reasonable chat limits
+@app.post("/api/v1/chat", dependencies=[Depends(rate_limit_chat)])
 async def chat_with_sol(
-    request: Request,
     message_data: ChatMessage,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Chat with Sol - Core companion feature"""
     
     # Generate session ID if not provided
-    session_id = message_data.session_id or f"session_{secrets.token_urlsafe(8)}"
+    session_id = message_data.session_id or session_id_pool.token_hex()
     
-    # Get conversation memory
+    # The semantic cache's embedding call only needs the message, so it runs
+    # while the history and mood are looked up
+    pending_embedding = personality_engine.start_embedding(message_data.message)
     memory_service = ConversationMemoryService(db, encryption_service)
-    recent_conversations = await memory_service.get_recent_conversations(
-        str(current_user.id), session_id, limit=5
-    )
+    context = await build_chat_context(memory_service, current_user, session_id)
     
-    # Get user's current mood/energy if available
-    latest_mood = db.query(MoodEnergyLog).filter(
-        MoodEnergyLog.user_id == current_user.id
-    ).order_by(MoodEnergyLog.logged_at.desc()).first()
-    
-    # Build conversation context
-    context = ConversationContext(
-        user_id=str(current_user.id),
-        session_id=session_id,
-        recent_conversations=recent_conversations,
-        user_mood=latest_mood.mood_rating if latest_mood else None,
-        user_energy=latest_mood.energy_level if latest_mood else None,
-        time_of_day=datetime.now().strftime("%H")
-    )
+    # End the read transaction before the model call so no pooled connection
+    # sits idle in a transaction while Sol thinks; storing the turn is then
+    # the request's one short write transaction with a single commit
+    await run_in_threadpool(db.close)
     
     # Generate Sol's response
-    sol_response = await personality_engine.generate_response(message_data.message, context)
+    sol_response = await personality_engine.generate_response(
+        message_data.message, context, pending_embedding=pending_embedding
+    )
     
     # Store conversation
-    conversation_id = await memory_service.store_conversation(
+    conversation_id = await run_in_threadpool(
+        memory_service.store_conversation,
         str(current_user.id),
         session_id,
         message_data.message,
         sol_response.response_text,
-        sol_response.conversation_type
+        sol_response.conversation_type,
+        cipher=current_user.cipher
     )
     
     return {
@@ -416,11 +616,145 @@ async def chat_with_sol(
         "personality_indicators": sol_response.personality_indicators
     }
 
+@app.post("/api/v1/chat/stream", dependencies=[Depends(rate_limit_chat)])
+async def stream_chat_with_sol(
+    message_data: ChatMessage,
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Chat with Sol, streaming the reply as Server-Sent Events"""
+    
+    # Generate session ID if not provided
+    session_id = message_data.session_id or session_id_pool.token_hex()
+    
+    # The semantic cache's embedding call only needs the message, so it runs
+    # while the history and mood are looked up
+    pending_embedding = personality_engine.start_embedding(message_data.message)
+    memory_service = ConversationMemoryService(db, encryption_service)
+    context = await build_chat_context(memory_service, current_user, session_id)
+    
+    # The request session is done once context is built; release its
+    # connection rather than holding it for the length of the stream
+    await run_in_threadpool(db.close)
+    
+    async def event_stream():
+        chunks: List[str] = []
+        sol_response = None
+        conversation_id = None
+        try:
+            async for item in personality_engine.stream_response(
+                message_data.message, context, pending_embedding=pending_embedding
+            ):
+                if isinstance(item, SolResponse):
+                    sol_response = item
+                else:
+                    chunks.append(item)
+                    yield sse_event("delta", {"text": item})
+        finally:
+            # Store whatever was generated, even if the client disconnected.
+            # A disconnect cancels this generator's scope, so the store is
+            # shielded or it would be cancelled before it ran
+            if chunks:
+                with anyio.CancelScope(shield=True):
+                    conversation_id = await run_in_threadpool(
+                        store_streamed_conversation,
+                        current_user,
+                        session_id,
+                        message_data.message,
+                        sol_response.response_text if sol_response else "".join(chunks),
+                        sol_response.conversation_type if sol_response else "general"
+                    )
+        
+        # Nothing to report if the reply never completed
+        if sol_response is None:
+            return
+        
+        yield sse_event("done", {
+            "session_id": session_id,
+            "conversation_id": conversation_id,
+            "conversation_type": sol_response.conversation_type,
+            "response_time_ms": sol_response.response_time_ms,
+            "personality_indicators": sol_response.personality_indicators
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def build_chat_context(
+    memory_service: ConversationMemoryService,
+    user: CachedUser,
+    session_id: str
+) -> ConversationContext:
+    """Gather recent conversation memory and mood for a chat turn"""
+    
+    # An active session's turns are usually already decrypted in memory;
+    # read them here rather than paying a worker-thread hop
+    recent_conversations = memory_service.get_cached_conversations(str(user.id), session_id, limit=5)
+    if recent_conversations is not None:
+        latest_mood = await run_in_threadpool(get_latest_mood, user.id)
+    else:
+        # The two lookups are independent, so run them side by side. A Session is
+        # not thread-safe, so the mood lookup uses its own (see get_latest_mood).
+        # The authenticated user already carries the encryption salt, so the
+        # memory service doesn't need to look it up again
+        recent_conversations, latest_mood = await asyncio.gather(
+            run_in_threadpool(
+                memory_service.get_recent_conversations,
+                str(user.id), session_id, limit=5,
+                cipher=user.cipher
+            ),
+            run_in_threadpool(get_latest_mood, user.id)
+        )
+    
+    # Build conversation context
+    return ConversationContext(
+        user_id=str(user.id),
+        session_id=session_id,
+        recent_conversations=recent_conversations,
+        user_mood=latest_mood.mood_rating if latest_mood else None,
+        user_energy=latest_mood.energy_level if latest_mood else None,
+        time_of_day=f"{datetime.now().hour:02d}"
+    )
+
+def get_latest_mood(user_id: str):
+    """Latest (mood_rating, energy_level) row for a user, on a short-lived session"""
+    with SessionLocal() as db:
+        return db.query(
+            MoodEnergyLog.mood_rating, MoodEnergyLog.energy_level
+        ).filter(
+            MoodEnergyLog.user_id == user_id
+        ).order_by(MoodEnergyLog.logged_at.desc()).first()
+
+def store_streamed_conversation(
+    user: CachedUser,
+    session_id: str,
+    user_message: str,
+    sol_response: str,
+    conversation_type: str
+) -> str:
+    """Store a streamed chat turn on its own session, which outlives the request's"""
+    with SessionLocal() as db:
+        return ConversationMemoryService(db, encryption_service).store_conversation(
+            str(user.id),
+            session_id,
+            user_message,
+            sol_response,
+            conversation_type,
+            cipher=user.cipher
+        )
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
 # Mood/Energy logging endpoint
 @app.post("/api/v1/mood-energy")
-async def log_mood_energy(
+def log_mood_energy(
     mood_data: MoodEnergyCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Quick mood and energy logging for ADHD pattern tracking"""
@@ -433,7 +767,8 @@ async def log_mood_energy(
         )
     
     # Determine time of day
-    current_hour = datetime.now().hour
+    now = datetime.now()
+    current_hour = now.hour
     if 6 <= current_hour < 12:
         time_of_day = "morning"
     elif 12 <= current_hour < 18:
@@ -445,92 +780,118 @@ async def log_mood_energy(
     notes_encrypted = None
     encryption_key_id = None
     if mood_data.notes:
-        notes_encrypted = encryption_service.encrypt_text(
-            str(current_user.id), current_user.encryption_salt, mood_data.notes
-        )
-        encryption_key_id = f"user:{current_user.id}:v1"
-    
-    # Create mood log
-    mood_log = MoodEnergyLog(
-        user_id=current_user.id,
-        mood_rating=mood_data.mood_rating,
-        energy_level=mood_data.energy_level,
-        notes_encrypted=notes_encrypted,
-        encryption_key_id=encryption_key_id,
-        time_of_day=time_of_day,
-        day_of_week=datetime.now().weekday(),
-        input_method=mood_data.input_method
-    )
-    
-    db.add(mood_log)
+        notes_encrypted = current_user.cipher.encrypt_text(mood_data.notes)
+        encryption_key_id = f"user:{current_user.id}:v3"
+    
+    # Create mood log - a Core insert skips the unit of work and returns
+    # the generated columns in the same roundtrip
+    mood_log = db.execute(
+        insert(MoodEnergyLog).values(
+            user_id=current_user.id,
+            mood_rating=mood_data.mood_rating,
+            energy_level=mood_data.energy_level,
+            notes_encrypted=notes_encrypted,
+            encryption_key_id=encryption_key_id,
+            time_of_day=time_of_day,
+            day_of_week=now.weekday(),
+            input_method=mood_data.input_method
+        ).returning(MoodEnergyLog.id, MoodEnergyLog.logged_at)
+    ).one()
     db.commit()
     
     return {
         "id": str(mood_log.id),
-        "mood_rating": mood_log.mood_rating,
-        "energy_level": mood_log.energy_level,
-        "time_of_day": mood_log.time_of_day,
+        "mood_rating": mood_data.mood_rating,
+        "energy_level": mood_data.energy_level,
+        "time_of_day": time_of_day,
         "logged_at": mood_log.logged_at.isoformat()
     }
 
 # Task management endpoints
 @app.post("/api/v1/tasks")
-async def create_task(
+def create_task(
     task_data: TaskCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create new task with ADHD-friendly features"""
     
-    task = Task(
-        user_id=current_user.id,
-        title=task_data.title,
-        description=task_data.description,
-        priority=task_data.priority,
-        category=task_data.category
-    )
-    
-    db.add(task)
+    # A Core insert skips the unit of work and returns the generated columns
+    task = db.execute(
+        insert(Task).values(
+            user_id=current_user.id,
+            title=task_data.title,
+            description=task_data.description,
+            priority=task_data.priority,
+            category=task_data.category
+        ).returning(Task.id, Task.status, Task.created_at)
+    ).one()
     db.commit()
-    db.refresh(task)
     
     return {
         "id": str(task.id),
-        "title": task.title,
-        "description": task.description,
+        "title": task_data.title,
+        "description": task_data.description,
         "status": task.status,
-        "priority": task.priority,
+        "priority": task_data.priority,
         "created_at": task.created_at.isoformat()
     }
 
 @app.get("/api/v1/tasks")
-async def get_tasks(
-    current_user: User = Depends(get_current_user),
+def get_tasks(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's tasks"""
-    
-    tasks = db.query(Task).filter(Task.user_id == current_user.id).order_by(Task.created_at.desc()).all()
-    
-    return [
-        {
-            "id": str(task.id),
-            "title": task.title,
-            "description": task.description,
-            "status": task.status,
-            "priority": task.priority,
-            "is_broken_down": task.is_broken_down,
-            "breakdown_steps": task.breakdown_steps,
-            "created_at": task.created_at.isoformat()
-        }
-        for task in tasks
-    ]
+    """
+    Get user's tasks, newest first, one page at a time. When there may be
+    more, the X-Next-Cursor response header holds the cursor for the next page.
+    """
+    
+    query = (
+        select(
+            Task.id,
+            Task.title,
+            Task.description,
+            Task.status,
+            Task.priority,
+            Task.is_broken_down,
+            Task.breakdown_steps,
+            Task.created_at
+        )
+        .where(Task.user_id == current_user.id)
+        # id breaks ties, so tasks created in the same instant are neither
+        # skipped nor repeated across pages
+        .order_by(Task.created_at.desc(), Task.id.desc())
+        .limit(limit)
+    )
+    if cursor:
+        query = query.where(tuple_(Task.created_at, Task.id) < parse_task_cursor(cursor))
+    
+    # Select plain column rows - listing tasks doesn't need ORM instances
+    rows = db.execute(query).mappings().all()
+    
+    # Plain dicts go straight to orjson, which encodes datetimes itself
+    response = ORJSONResponse(content=[dict(row) for row in rows])
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = f"{last['created_at'].isoformat()}_{last['id']}"
+    return response
+
+def parse_task_cursor(cursor: str) -> tuple:
+    """(created_at, id) from a task listing cursor ("<created_at ISO>_<id>")"""
+    created_at, _, task_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(created_at), str(uuid.UUID(task_id))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 @app.patch("/api/v1/tasks/{task_id}")
-async def update_task(
-    task_id: str,
+def update_task(
+    task_id: ResourceIdPath,
     task_data: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update task"""
@@ -573,9 +934,9 @@ async def update_task(
     }
 
 @app.delete("/api/v1/tasks/{task_id}")
-async def delete_task(
-    task_id: str,
-    current_user: User = Depends(get_current_user),
+def delete_task(
+    task_id: ResourceIdPath,
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete task"""
@@ -594,10 +955,37 @@ async def delete_task(
     return {"message": "Task deleted successfully"}
 
 # Journal management endpoints
-@app.post("/api/v1/journal")
-async def create_journal_entry(
+# Journal text fields stored encrypted with the user's key
+JOURNAL_ENCRYPTED_FIELDS = ("title", "content", "accomplishments", "challenges", "gratitude", "tomorrow_focus")
+
+def serialize_journal_entry(entry: JournalEntry, user: CachedUser) -> Dict[str, Any]:
+    """Decrypt a journal entry for an API response"""
+    decrypted = user.cipher.decrypt_fields(
+        {name: getattr(entry, name) for name in JOURNAL_ENCRYPTED_FIELDS}
+    )
+    return {
+        "id": entry.id,
+        "title": decrypted["title"],
+        "content": decrypted["content"],
+        "mood_rating": entry.mood_rating,
+        "energy_level": entry.energy_level,
+        "focus_level": entry.focus_level,
+        "anxiety_level": entry.anxiety_level,
+        "accomplishments": decrypted["accomplishments"],
+        "challenges": decrypted["challenges"],
+        "gratitude": decrypted["gratitude"],
+        "tomorrow_focus": decrypted["tomorrow_focus"],
+        "emotional_tags": entry.emotional_tags,
+        "entry_date": entry.entry_date,
+        "is_favorite": entry.is_favorite,
+        "created_at": entry.created_at,
+        "updated_at": entry.updated_at
+    }
+
+@app.post("/api/v1/journal", response_model=JournalEntryResponse)
+def create_journal_entry(
     entry_data: JournalEntryCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new journal entry"""
@@ -606,48 +994,35 @@ async def create_journal_entry(
     entry_date = entry_data.entry_date or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
     # Encrypt sensitive content
-    encrypted_title = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.title)
-    encrypted_content = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.content)
-    
-    encrypted_accomplishments = None
-    encrypted_challenges = None
-    encrypted_gratitude = None
-    encrypted_tomorrow_focus = None
-    
-    if entry_data.accomplishments:
-        encrypted_accomplishments = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.accomplishments)
-    if entry_data.challenges:
-        encrypted_challenges = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.challenges)
-    if entry_data.gratitude:
-        encrypted_gratitude = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.gratitude)
-    if entry_data.tomorrow_focus:
-        encrypted_tomorrow_focus = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.tomorrow_focus)
+    encrypted = current_user.cipher.encrypt_fields({
+        "title": entry_data.title,
+        "content": entry_data.content,
+        "accomplishments": entry_data.accomplishments or None,
+        "challenges": entry_data.challenges or None,
+        "gratitude": entry_data.gratitude or None,
+        "tomorrow_focus": entry_data.tomorrow_focus or None
+    })
     
     # Create journal entry
     journal_entry = JournalEntry(
         user_id=current_user.id,
-        title=encrypted_title,
-        content=encrypted_content,
         mood_rating=entry_data.mood_rating,
         energy_level=entry_data.energy_level,
         focus_level=entry_data.focus_level,
         anxiety_level=entry_data.anxiety_level,
-        accomplishments=encrypted_accomplishments,
-        challenges=encrypted_challenges,
-        gratitude=encrypted_gratitude,
-        tomorrow_focus=encrypted_tomorrow_focus,
         emotional_tags=entry_data.emotional_tags,
         entry_date=entry_date,
-        is_favorite=entry_data.is_favorite
+        is_favorite=entry_data.is_favorite,
+        **encrypted
     )
     
+    # Build the response from flushed defaults before commit expires the instance
     db.add(journal_entry)
-    db.commit()
-    db.refresh(journal_entry)
+    db.flush()
     
     # Return decrypted entry
-    return {
-        "id": str(journal_entry.id),
+    response = {
+        "id": journal_entry.id,
         "title": entry_data.title,
         "content": entry_data.content,
         "mood_rating": journal_entry.mood_rating,
@@ -659,17 +1034,20 @@ async def create_journal_entry(
         "gratitude": entry_data.gratitude,
         "tomorrow_focus": entry_data.tomorrow_focus,
         "emotional_tags": journal_entry.emotional_tags,
-        "entry_date": journal_entry.entry_date.isoformat(),
+        "entry_date": journal_entry.entry_date,
         "is_favorite": journal_entry.is_favorite,
-        "created_at": journal_entry.created_at.isoformat(),
-        "updated_at": journal_entry.updated_at.isoformat()
+        "created_at": journal_entry.created_at,
+        "updated_at": journal_entry.updated_at
     }
+    db.commit()
+    
+    return response
 
 @app.get("/api/v1/journal")
-async def get_journal_entries(
+def get_journal_entries(
     limit: int = 20,
     offset: int = 0,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get user's journal entries"""
@@ -678,34 +1056,22 @@ async def get_journal_entries(
         JournalEntry.user_id == current_user.id
     ).order_by(JournalEntry.entry_date.desc()).offset(offset).limit(limit).all()
     
-    # Decrypt and return entries
-    decrypted_entries = []
-    for entry in entries:
-        decrypted_entries.append({
-            "id": str(entry.id),
-            "title": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.title),
-            "content": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.content),
-            "mood_rating": entry.mood_rating,
-            "energy_level": entry.energy_level,
-            "focus_level": entry.focus_level,
-            "anxiety_level": entry.anxiety_level,
-            "accomplishments": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.accomplishments) if entry.accomplishments else None,
-            "challenges": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.challenges) if entry.challenges else None,
-            "gratitude": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.gratitude) if entry.gratitude else None,
-            "tomorrow_focus": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.tomorrow_focus) if entry.tomorrow_focus else None,
-            "emotional_tags": entry.emotional_tags,
-            "entry_date": entry.entry_date.isoformat(),
-            "is_favorite": entry.is_favorite,
-            "created_at": entry.created_at.isoformat(),
-            "updated_at": entry.updated_at.isoformat()
-        })
-    
-    return {"entries": decrypted_entries}
+    # Decrypt one entry at a time while streaming, so only one entry's
+    # plaintext is alive at once instead of the whole page
+    def stream_entries():
+        yield b'{"entries":['
+        for index, entry in enumerate(entries):
+            if index:
+                yield b','
+            yield orjson.dumps(serialize_journal_entry(entry, current_user))
+        yield b']}'
+    
+    return StreamingResponse(stream_entries(), media_type="application/json")
 
-@app.get("/api/v1/journal/{entry_id}")
-async def get_journal_entry(
-    entry_id: str,
-    current_user: User = Depends(get_current_user),
+@app.get("/api/v1/journal/{entry_id}", response_model=JournalEntryResponse)
+def get_journal_entry(
+    entry_id: ResourceIdPath,
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific journal entry"""
@@ -718,94 +1084,48 @@ async def get_journal_entry(
     if not entry:
         raise HTTPException(status_code=404, detail="Journal entry not found")
     
-    return {
-        "id": str(entry.id),
-        "title": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.title),
-        "content": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.content),
-        "mood_rating": entry.mood_rating,
-        "energy_level": entry.energy_level,
-        "focus_level": entry.focus_level,
-        "anxiety_level": entry.anxiety_level,
-        "accomplishments": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.accomplishments) if entry.accomplishments else None,
-        "challenges": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.challenges) if entry.challenges else None,
-        "gratitude": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.gratitude) if entry.gratitude else None,
-        "tomorrow_focus": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.tomorrow_focus) if entry.tomorrow_focus else None,
-        "emotional_tags": entry.emotional_tags,
-        "entry_date": entry.entry_date.isoformat(),
-        "is_favorite": entry.is_favorite,
-        "created_at": entry.created_at.isoformat(),
-        "updated_at": entry.updated_at.isoformat()
-    }
+    return serialize_journal_entry(entry, current_user)
 
-@app.patch("/api/v1/journal/{entry_id}")
-async def update_journal_entry(
-    entry_id: str,
+@app.patch("/api/v1/journal/{entry_id}", response_model=JournalEntryResponse)
+def update_journal_entry(
+    entry_id: ResourceIdPath,
     entry_data: JournalEntryUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a journal entry"""
     
-    entry = db.query(JournalEntry).filter(
-        JournalEntry.id == entry_id,
-        JournalEntry.user_id == current_user.id
-    ).first()
+    # Fields the client provided; empty optional text clears the field
+    updates = entry_data.model_dump(exclude_none=True)
+    text_updates = {
+        name: value if name in ("title", "content") else value or None
+        for name in JOURNAL_ENCRYPTED_FIELDS
+        if (value := updates.get(name)) is not None
+    }
+    if text_updates:
+        updates.update(current_user.cipher.encrypt_fields(text_updates))
+    
+    # One UPDATE of just those columns doubles as the ownership check, and
+    # RETURNING hands back the row for the response
+    entry = db.execute(
+        update(JournalEntry)
+        .where(JournalEntry.id == entry_id, JournalEntry.user_id == current_user.id)
+        .values(**updates, updated_at=datetime.utcnow())
+        .returning(JournalEntry)
+    ).scalar_one_or_none()
     
     if not entry:
         raise HTTPException(status_code=404, detail="Journal entry not found")
     
-    # Update fields that were provided
-    if entry_data.title is not None:
-        entry.title = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.title)
-    if entry_data.content is not None:
-        entry.content = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.content)
-    if entry_data.mood_rating is not None:
-        entry.mood_rating = entry_data.mood_rating
-    if entry_data.energy_level is not None:
-        entry.energy_level = entry_data.energy_level
-    if entry_data.focus_level is not None:
-        entry.focus_level = entry_data.focus_level
-    if entry_data.anxiety_level is not None:
-        entry.anxiety_level = entry_data.anxiety_level
-    if entry_data.accomplishments is not None:
-        entry.accomplishments = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.accomplishments) if entry_data.accomplishments else None
-    if entry_data.challenges is not None:
-        entry.challenges = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.challenges) if entry_data.challenges else None
-    if entry_data.gratitude is not None:
-        entry.gratitude = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.gratitude) if entry_data.gratitude else None
-    if entry_data.tomorrow_focus is not None:
-        entry.tomorrow_focus = encryption_service.encrypt_text(current_user.id, current_user.encryption_salt, entry_data.tomorrow_focus) if entry_data.tomorrow_focus else None
-    if entry_data.emotional_tags is not None:
-        entry.emotional_tags = entry_data.emotional_tags
-    if entry_data.is_favorite is not None:
-        entry.is_favorite = entry_data.is_favorite
-    
-    entry.updated_at = datetime.utcnow()
+    response = serialize_journal_entry(entry, current_user)
     db.commit()
     
-    return {
-        "id": str(entry.id),
-        "title": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.title),
-        "content": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.content),
-        "mood_rating": entry.mood_rating,
-        "energy_level": entry.energy_level,
-        "focus_level": entry.focus_level,
-        "anxiety_level": entry.anxiety_level,
-        "accomplishments": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.accomplishments) if entry.accomplishments else None,
-        "challenges": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.challenges) if entry.challenges else None,
-        "gratitude": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.gratitude) if entry.gratitude else None,
-        "tomorrow_focus": encryption_service.decrypt_text(current_user.id, current_user.encryption_salt, entry.tomorrow_focus) if entry.tomorrow_focus else None,
-        "emotional_tags": entry.emotional_tags,
-        "entry_date": entry.entry_date.isoformat(),
-        "is_favorite": entry.is_favorite,
-        "created_at": entry.created_at.isoformat(),
-        "updated_at": entry.updated_at.isoformat()
-    }
+    return response
 
 @app.delete("/api/v1/journal/{entry_id}")
-async def delete_journal_entry(
-    entry_id: str,
-    current_user: User = Depends(get_current_user),
+def delete_journal_entry(
+    entry_id: ResourceIdPath,
+    current_user: CachedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a journal entry"""
@@ -823,11 +1143,40 @@ async def delete_journal_entry(
     
     return {"message": "Journal entry deleted successfully"}
 
+# The summary is static configuration, so encode it once and serve the bytes
+PERSONALITY_SUMMARY_BYTES = orjson.dumps(dict(personality_engine.get_personality_summary()))
+
+@app.get("/api/v1/privacy/export")
+def export_user_data(
+    current_user: CachedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export all of the user's data as NDJSON (Right to Data Portability)"""
+
+    gdpr_service = GDPRComplianceService(db, encryption_service)
+    return StreamingResponse(
+        gdpr_service.stream_user_data_ndjson(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="sol-os-export.ndjson"'}
+    )
+
 @app.get("/api/v1/sol/personality")
 async def get_sol_personality():
     """Get Sol's personality summary for users"""
-    return personality_engine.get_personality_summary()
+    return Response(
+        content=PERSONALITY_SUMMARY_BYTES,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8004)
\ No newline at end of file
+    # Caches and the chat rate limiter are per process, so each worker keeps its own
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8004,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )
\ No newline at end of file
@@ -3,25 +3,34 @@ Sol OS MVP Database Models - Security-First ADHD AI Companion
 Enhanced with encryption, privacy controls, and GDPR compliance
 """
 
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, ForeignKey, LargeBinary, JSON
+from sqlalchemy import Column, String, Boolean, DateTime, Text, Integer, ForeignKey, LargeBinary, JSON, Index, Uuid, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 import uuid
 
 Base = declarative_base()
 
+# Ids are native UUID columns on Postgres (16 bytes, integer comparisons) and
+# CHAR(32) elsewhere, but stay hyphenated strings in Python
+IdType = Uuid(as_uuid=False)
+
+# JSON documents are stored pre-parsed as JSONB on Postgres (no reparse on
+# read, containment queries can use GIN indexes) and as JSON text elsewhere
+JsonType = JSON().with_variant(JSONB(), "postgresql")
+
 class User(Base):
     """Enhanced user model with security-first design and GDPR compliance"""
     __tablename__ = "users"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
     
     # Security-enhanced email storage
     email_hash = Column(String(255), unique=True, nullable=False, index=True)  # For indexing
-    email_encrypted = Column(LargeBinary, nullable=False)  # Actual encrypted email
+    email_encrypted = deferred(Column(LargeBinary, nullable=False))  # Actual encrypted email, only read for export
     username = Column(String(100), unique=True, nullable=False, index=True)
-    password_hash = Column(String(255), nullable=False)  # bcrypt with high rounds
+    password_hash = Column(String(255), nullable=False)  # argon2id (legacy rows: bcrypt)
     
     # Account security
     is_active = Column(Boolean, default=True)
@@ -48,6 +57,8 @@ class User(Base):
     google_calendar_token_expires_at = Column(DateTime)
     google_calendar_connected = Column(Boolean, default=False)
     google_calendar_sync_enabled = Column(Boolean, default=True)
+    google_calendar_sync_token = Column(Text)  # nextSyncToken for incremental sync
+    google_calendar_events_etag = Column(String(255))  # ETag of last events listing
     
     # User encryption key management
     encryption_salt = Column(LargeBinary, nullable=False)
@@ -70,13 +81,14 @@ class Conversation(Base):
     """Encrypted conversation storage with minimal complexity for MVP"""
     __tablename__ = "conversations"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
-    session_id = Column(String(255), nullable=False, index=True)
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(String(255), nullable=False)
     
-    # Encrypted conversation content
-    message_content_encrypted = Column(LargeBinary, nullable=False)
-    sol_response_encrypted = Column(LargeBinary, nullable=False)
+    # Encrypted conversation content - deferred, readers that decrypt ask for
+    # it with undefer_group("content")
+    message_content_encrypted = deferred(Column(LargeBinary, nullable=False), group="content")
+    sol_response_encrypted = deferred(Column(LargeBinary, nullable=False), group="content")
     
     # Encryption metadata
     encryption_key_id = Column(String(50), nullable=False)
@@ -84,19 +96,26 @@ class Conversation(Base):
     # Minimal metadata for MVP (no complex memory linking)
     conversation_type = Column(String(20), default='general')
     
-    # Audit trail
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Audit trail - part of the primary key because Postgres partitions on it
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     created_by = Column(String(45))  # IP address for security audit
     
     # Relationships
     user = relationship("User", back_populates="conversations")
+    
+    # Recent turns are read per user and session, newest first. On Postgres
+    # the table is split into monthly partitions (see partitions.py).
+    __table_args__ = (
+        Index("ix_conversations_user_session_created", user_id, session_id, created_at.desc()),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
 class MoodEnergyLog(Base):
     """Simple mood and energy tracking for ADHD patterns"""
     __tablename__ = "mood_energy_logs"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Core tracking data (simple 1-5 scale for MVP)
     mood_rating = Column(Integer, nullable=False)  # 1-5 scale
@@ -112,17 +131,22 @@ class MoodEnergyLog(Base):
     
     # Input method tracking
     input_method = Column(String(20), default='tap')  # tap, voice, emoji
-    logged_at = Column(DateTime, default=datetime.utcnow, index=True)
+    logged_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="mood_energy_logs")
+    
+    # Latest mood lookup is per user, newest first
+    __table_args__ = (
+        Index("ix_mood_energy_logs_user_logged", user_id, logged_at.desc()),
+    )
 
 class Task(Base):
     """Simple ADHD-friendly task management for MVP"""
     __tablename__ = "tasks"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Basic task details
     title = Column(String(255), nullable=False)
@@ -130,7 +154,7 @@ class Task(Base):
     
     # Simple ADHD features for MVP
     is_broken_down = Column(Boolean, default=False)  # Has been decomposed
-    breakdown_steps = Column(JSON, default=[])  # Simple list of micro-tasks
+    breakdown_steps = Column(JsonType, default=list)  # Simple list of micro-tasks
     
     # Basic scheduling
     scheduled_start = Column(DateTime)
@@ -150,13 +174,23 @@ class Task(Base):
     
     # Relationships
     user = relationship("User", back_populates="tasks")
+    
+    # Task lists are read per user, newest first
+    __table_args__ = (
+        Index("ix_tasks_user_created", user_id, created_at.desc(), id.desc()),
+    )
+
+# Blocks that should be in Google Calendar but have not been pushed yet, in
+# the form each dialect renders `google_calendar_sync_enabled == True` (the
+# planner only uses a partial index when the query's terms match it)
+UNSYNCED_TIME_BLOCK = "google_calendar_sync_enabled {} AND google_calendar_event_id IS NULL"
 
 class TimeBlock(Base):
     """Simple visual time-blocking for ADHD planning"""
     __tablename__ = "time_blocks"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Time block details
     title = Column(String(255), nullable=False)
@@ -172,7 +206,7 @@ class TimeBlock(Base):
     buffer_time_minutes = Column(Integer, default=10)  # Transition buffer
     
     # Task integration
-    linked_task_id = Column(String(36), ForeignKey("tasks.id"))
+    linked_task_id = Column(IdType, ForeignKey("tasks.id", ondelete="SET NULL"))
     
     # Google Calendar sync
     google_calendar_event_id = Column(String(255))  # Google Calendar event ID
@@ -192,14 +226,29 @@ class TimeBlock(Base):
     # Relationships
     user = relationship("User", back_populates="time_blocks")
     linked_task = relationship("Task")
+    
+    # Calendar views range-scan a user's blocks in start_time order; Google
+    # sync only ever matches event ids by equality, so a hash index (smaller,
+    # and NULL for unsynced blocks is left out) suits it on Postgres.
+    # Pushing pending blocks only looks at the few never-pushed rows, so
+    # that index is partial and stays small however many blocks are synced.
+    __table_args__ = (
+        Index("ix_time_blocks_user_start", user_id, start_time),
+        Index("ix_time_blocks_google_event", google_calendar_event_id, postgresql_using="hash"),
+        Index(
+            "ix_time_blocks_unsynced", user_id,
+            postgresql_where=text(UNSYNCED_TIME_BLOCK.format("= true")),
+            sqlite_where=text(UNSYNCED_TIME_BLOCK.format("= 1")),
+        ),
+    )
 
 class FocusSession(Base):
     """Simple focus timer sessions for MVP"""
     __tablename__ = "focus_sessions"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
-    task_id = Column(String(36), ForeignKey("tasks.id"))
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(IdType, ForeignKey("tasks.id", ondelete="SET NULL"))
     
     # Session configuration (simple for MVP)
     session_type = Column(String(20), default='pomodoro')  # pomodoro, custom
@@ -226,8 +275,8 @@ class JournalEntry(Base):
     """ADHD-friendly journal entries with mood tracking and encrypted content"""
     __tablename__ = "journal_entries"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Entry content (encrypted for privacy)
     title = Column(LargeBinary)           # Encrypted title
@@ -246,10 +295,10 @@ class JournalEntry(Base):
     tomorrow_focus = Column(LargeBinary)   # Main focus for tomorrow (encrypted)
     
     # Quick emotional tags for pattern recognition
-    emotional_tags = Column(JSON, default=[])  # ['happy', 'anxious', 'productive', etc.]
+    emotional_tags = Column(JsonType, default=list)  # ['happy', 'anxious', 'productive', etc.]
     
     # Entry metadata
-    entry_date = Column(DateTime, nullable=False, index=True)  # User's intended date
+    entry_date = Column(DateTime, nullable=False)  # User's intended date
     is_favorite = Column(Boolean, default=False)
     is_private = Column(Boolean, default=True)   # Extra privacy flag
     
@@ -259,16 +308,22 @@ class JournalEntry(Base):
     
     # Relationships
     user = relationship("User", back_populates="journal_entries")
+    
+    # Journal pages are read per user, newest entry_date first
+    __table_args__ = (
+        Index("ix_journal_entries_user_date", user_id, entry_date.desc()),
+    )
 
 class SecurityAuditLog(Base):
     """Security audit logging for compliance and monitoring"""
     __tablename__ = "security_audit_logs"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(IdType, primary_key=True, default=lambda: str(uuid.uuid4()))
     
     # Event details
     event_type = Column(String(50), nullable=False)  # login, data_access, consent_change, etc.
-    user_id = Column(String(36), ForeignKey("users.id"))
+    user_id = Column(IdType, ForeignKey("users.id", ondelete="SET NULL"))  # Audit rows outlive the user
+    email_hash = Column(String(32))  # hash_email_for_index, for events tied to a login email
     
     # Security context
     ip_address = Column(String(45))
@@ -276,11 +331,19 @@ class SecurityAuditLog(Base):
     success = Column(Boolean, default=True)
     
     # Event details
-    event_details = Column(JSON, default={})
+    event_details = Column(JsonType, default=dict)
     risk_level = Column(String(10), default='low')  # low, medium, high, critical
     
-    # Audit trail
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    # Audit trail - part of the primary key because Postgres partitions on it
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Relationships
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+    
+    # Lockout checks count one email's events of a type within a recent
+    # window; ad-hoc audit queries match on detail keys with JSONB containment
+    __table_args__ = (
+        Index("ix_security_audit_logs_email_event_timestamp", email_hash, event_type, timestamp),
+        Index("ix_security_audit_logs_details", event_details, postgresql_using="gin").ddl_if(dialect="postgresql"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
\ No newline at end of file
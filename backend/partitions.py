@@ -0,0 +1,105 @@
+"""
+Sol OS MVP Table Partition Maintenance
+Monthly range partitions for append-mostly history tables (PostgreSQL only)
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = structlog.get_logger()
+
+# Parent tables declared with postgresql_partition_by in models.py
+PARTITIONED_TABLES = ("conversations", "security_audit_logs")
+
+# Retention applied when no user has a longer data_retention_days
+DEFAULT_RETENTION_DAYS = 365
+
+MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+
+# asyncio only keeps weak references to tasks, so the daily loop is held here
+_maintenance_task: Optional[asyncio.Task] = None
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def ensure_partitions(engine: Engine, months_ahead: int = 1) -> None:
+    """
+    Create this month's partition and the next `months_ahead` for each table,
+    plus a DEFAULT partition so inserts still succeed if maintenance falls behind
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    # One transaction per table, so a failure on one leaves the other intact
+    for table in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+            start = _month_start(datetime.utcnow())
+            for _ in range(months_ahead + 1):
+                end = _next_month(start)
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y_%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+                start = end
+
+def drop_expired_partitions(engine: Engine) -> None:
+    """Drop monthly partitions whose every row is past the longest user retention"""
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        # A partition is shared by all users, so only the longest retention
+        # period any user has chosen makes it safe to drop
+        retention_days = conn.execute(
+            text("SELECT MAX(data_retention_days) FROM users")
+        ).scalar() or DEFAULT_RETENTION_DAYS
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+        for table in PARTITIONED_TABLES:
+            partitions = conn.execute(text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :table"
+            ), {"table": table}).scalars().all()
+
+            for partition in partitions:
+                try:
+                    month = datetime.strptime(partition[len(table) + 1:], "%Y_%m")
+                except ValueError:
+                    continue  # Not one of ours
+                if _next_month(month) <= cutoff:
+                    conn.execute(text(f"DROP TABLE {partition}"))
+                    logger.info("Dropped expired partition", partition=partition)
+
+async def run_partition_maintenance(engine: Engine) -> None:
+    """Keep upcoming partitions created and expired ones dropped, once a day"""
+    while True:
+        try:
+            await asyncio.to_thread(ensure_partitions, engine)
+            await asyncio.to_thread(drop_expired_partitions, engine)
+        except Exception as e:
+            logger.error("Partition maintenance failed", error=str(e))
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+def start_partition_maintenance_task(engine: Engine) -> None:
+    """Run run_partition_maintenance in the background; call from the app's startup"""
+    global _maintenance_task
+    _maintenance_task = asyncio.create_task(run_partition_maintenance(engine))
+
+async def stop_partition_maintenance_task() -> None:
+    """Cancel the background maintenance loop"""
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
@@ -3,19 +3,38 @@ Google Calendar API Routes
 OAuth flow and sync endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, lambda_stmt, select
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from database import get_db
 from models import User, TimeBlock
 from security import get_current_user
 from google_calendar import google_calendar_service
-from schemas import TimeBlockResponse, CalendarSyncStatus
+from schemas import ResourceIdPath, TimeBlockCreate, TimeBlockUpdate, TimeBlockResponse, TimeBlockBatchSync, CalendarSyncStatus
 
 router = APIRouter(prefix="/api/v1/calendar", tags=["calendar"])
 
+# Columns TimeBlockResponse needs, for listings that skip ORM instances
+TIME_BLOCK_RESPONSE_COLUMNS = tuple(getattr(TimeBlock, field) for field in TimeBlockResponse.model_fields)
+
+# Rows fetched from the cursor per chunk when streaming a listing
+TIME_BLOCK_STREAM_BATCH = 200
+
+def get_owned_time_block(db: Session, time_block_id: str, user_id: str) -> Optional[TimeBlock]:
+    """Load a time block only if it belongs to the user"""
+    # Primary-key get hits the session identity map before the database;
+    # ownership is then a plain comparison on the loaded row
+    time_block = db.get(TimeBlock, time_block_id)
+    if time_block is None or time_block.user_id != user_id:
+        return None
+    return time_block
+
 @router.get("/connect")
 async def connect_google_calendar(current_user: User = Depends(get_current_user)):
     """Initiate Google Calendar OAuth flow"""
@@ -36,14 +55,16 @@ async def oauth_callback(
     if error:
         raise HTTPException(status_code=400, detail=f"OAuth error: {error}")
     
-    success = google_calendar_service.handle_oauth_callback(code, state, db)
+    success = await google_calendar_service.run_blocking(
+        google_calendar_service.handle_oauth_callback, code, state, db
+    )
     if not success:
         raise HTTPException(status_code=400, detail="Failed to process OAuth callback")
     
     return {"message": "Google Calendar connected successfully"}
 
 @router.delete("/disconnect")
-async def disconnect_google_calendar(
+def disconnect_google_calendar(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -54,7 +75,7 @@ async def disconnect_google_calendar(
     
     return {"message": "Google Calendar disconnected successfully"}
 
-@router.get("/status")
+@router.get("/status", response_model=CalendarSyncStatus)
 async def get_calendar_status(current_user: User = Depends(get_current_user)):
     """Get Google Calendar connection status"""
     return CalendarSyncStatus(
@@ -73,15 +94,80 @@ async def sync_from_google(
     if not current_user.google_calendar_connected:
         raise HTTPException(status_code=400, detail="Google Calendar not connected")
     
-    success = google_calendar_service.sync_from_google(current_user, db, days_ahead)
+    success = await google_calendar_service.run_blocking(
+        google_calendar_service.sync_from_google, current_user, db, days_ahead
+    )
     if not success:
         raise HTTPException(status_code=500, detail="Failed to sync from Google Calendar")
     
     return {"message": f"Synced events from Google Calendar for next {days_ahead} days"}
 
+@router.post("/sync/to-google")
+async def sync_pending_to_google(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Push all time blocks not yet in Google Calendar"""
+    if not current_user.google_calendar_connected:
+        raise HTTPException(status_code=400, detail="Google Calendar not connected")
+    
+    pending_blocks = await run_in_threadpool(db.query(TimeBlock).filter(
+        TimeBlock.user_id == current_user.id,
+        TimeBlock.google_calendar_sync_enabled == True,
+        TimeBlock.google_calendar_event_id.is_(None)
+    ).all)
+    
+    event_ids = await google_calendar_service.create_events_bulk(current_user, pending_blocks, db)
+    synced_count = apply_sync_results(pending_blocks, event_ids)
+    await run_in_threadpool(db.commit)
+    
+    return {"message": f"Synced {synced_count} of {len(pending_blocks)} time blocks to Google Calendar"}
+
+@router.post("/sync/to-google/batch")
+async def sync_batch_to_google(
+    sync_request: TimeBlockBatchSync,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Sync selected time blocks to Google Calendar in batched requests"""
+    if not current_user.google_calendar_connected:
+        raise HTTPException(status_code=400, detail="Google Calendar not connected")
+    
+    user_id, time_block_ids = current_user.id, sync_request.time_block_ids
+    time_blocks = await run_in_threadpool(lambda: db.execute(
+        select(TimeBlock).where(TimeBlock.user_id == user_id, TimeBlock.id.in_(time_block_ids))
+    ).scalars().all())
+    
+    # Blocks already in Google are updated, the rest inserted, all batched
+    ops = [('update' if block.google_calendar_event_id else 'insert', block) for block in time_blocks]
+    event_ids = await google_calendar_service.run_blocking(
+        google_calendar_service.push_many, current_user, ops, db
+    )
+    synced_count = apply_sync_results(time_blocks, event_ids)
+    await run_in_threadpool(db.commit)
+    
+    return {"message": f"Synced {synced_count} of {len(time_blocks)} time blocks to Google Calendar"}
+
+def apply_sync_results(time_blocks: List[TimeBlock], event_ids: Dict[str, Optional[str]]) -> int:
+    """Record per-block Google sync results; the caller commits once. Returns the synced count"""
+    synced_count = 0
+    synced_at = datetime.utcnow()
+    for time_block in time_blocks:
+        event_id = event_ids.get(time_block.id)
+        if event_id:
+            time_block.google_calendar_event_id = event_id
+            time_block.sync_status = 'synced'
+            time_block.last_synced_at = synced_at
+            time_block.sync_error = None
+            synced_count += 1
+        else:
+            time_block.sync_status = 'error'
+            time_block.sync_error = 'Failed to sync to Google Calendar'
+    return synced_count
+
 @router.post("/sync/to-google/{time_block_id}")
 async def sync_to_google(
-    time_block_id: str,
+    time_block_id: ResourceIdPath,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -90,10 +176,7 @@ async def sync_to_google(
         raise HTTPException(status_code=400, detail="Google Calendar not connected")
     
     # Get time block
-    time_block = db.query(TimeBlock).filter(
-        TimeBlock.id == time_block_id,
-        TimeBlock.user_id == current_user.id
-    ).first()
+    time_block = await run_in_threadpool(get_owned_time_block, db, time_block_id, current_user.id)
     
     if not time_block:
         raise HTTPException(status_code=404, detail="Time block not found")
@@ -101,10 +184,14 @@ async def sync_to_google(
     try:
         if time_block.google_calendar_event_id:
             # Update existing event
-            success = google_calendar_service.update_google_event(current_user, time_block)
+            success = await google_calendar_service.run_blocking(
+                google_calendar_service.update_google_event, current_user, time_block, db
+            )
         else:
             # Create new event
-            event_id = google_calendar_service.create_google_event(current_user, time_block)
+            event_id = await google_calendar_service.run_blocking(
+                google_calendar_service.create_google_event, current_user, time_block, db
+            )
             if event_id:
                 time_block.google_calendar_event_id = event_id
                 success = True
@@ -119,7 +206,7 @@ async def sync_to_google(
             time_block.sync_status = 'error'
             time_block.sync_error = 'Failed to sync to Google Calendar'
         
-        db.commit()
+        await run_in_threadpool(db.commit)
         
         if not success:
             raise HTTPException(status_code=500, detail="Failed to sync to Google Calendar")
@@ -129,148 +216,147 @@ async def sync_to_google(
     except Exception as e:
         time_block.sync_status = 'error'
         time_block.sync_error = str(e)
-        db.commit()
+        await run_in_threadpool(db.commit)
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
 
 @router.get("/time-blocks", response_model=List[TimeBlockResponse])
-async def get_time_blocks(
+def get_time_blocks(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get time blocks with optional date filtering"""
-    query = db.query(TimeBlock).filter(TimeBlock.user_id == current_user.id)
+    user_id = current_user.id
+    
+    # Select just the response columns as plain rows - no ORM instances,
+    # identity map or relationship loading for a read-only listing
+    stmt = lambda_stmt(
+        lambda: select(*TIME_BLOCK_RESPONSE_COLUMNS).where(TimeBlock.user_id == user_id)
+    )
     
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
-            query = query.filter(TimeBlock.start_time >= start_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid start_date format")
+        stmt += lambda s: s.where(TimeBlock.start_time >= start_dt)
     
     if end_date:
         try:
             end_dt = datetime.fromisoformat(end_date)
-            query = query.filter(TimeBlock.end_time <= end_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid end_date format")
+        stmt += lambda s: s.where(TimeBlock.end_time <= end_dt)
+    
+    stmt += lambda s: s.order_by(TimeBlock.start_time)
+    rows = db.execute(stmt, execution_options={"yield_per": TIME_BLOCK_STREAM_BATCH}).mappings()
+    
+    # Stream the JSON array a batch of rows at a time as they come off the
+    # cursor, instead of materializing a long range before the first byte.
+    # orjson encodes the datetimes in the plain row dicts itself.
+    def stream_time_blocks():
+        yield b'['
+        for index, batch in enumerate(rows.partitions()):
+            if index:
+                yield b','
+            yield b','.join(orjson.dumps(dict(row)) for row in batch)
+        yield b']'
     
-    time_blocks = query.order_by(TimeBlock.start_time).all()
-    return time_blocks
+    return StreamingResponse(stream_time_blocks(), media_type="application/json")
 
 @router.post("/time-blocks", response_model=TimeBlockResponse)
 async def create_time_block(
-    time_block_data: dict,
+    time_block_data: TimeBlockCreate,
+    background_tasks: BackgroundTasks,
     sync_to_google: bool = Query(True),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create new time block with optional Google Calendar sync"""
     try:
-        # Create time block
-        new_block = TimeBlock(
-            user_id=current_user.id,
-            title=time_block_data['title'],
-            description=time_block_data.get('description'),
-            location=time_block_data.get('location'),
-            start_time=datetime.fromisoformat(time_block_data['start_time']),
-            end_time=datetime.fromisoformat(time_block_data['end_time']),
-            all_day=time_block_data.get('all_day', False),
-            block_type=time_block_data.get('block_type', 'work'),
-            color=time_block_data.get('color', '#4A90E2'),
-            is_flexible=time_block_data.get('is_flexible', False),
-            buffer_time_minutes=time_block_data.get('buffer_time_minutes', 10),
-            google_calendar_sync_enabled=sync_to_google and current_user.google_calendar_connected
+        # Create time block - TimeBlockCreate has already parsed and validated the fields
+        block_fields = time_block_data.model_dump()
+        block_fields["google_calendar_sync_enabled"] = (
+            block_fields["google_calendar_sync_enabled"] and sync_to_google
+            and current_user.google_calendar_connected
         )
+        # A Core insert skips the unit of work and returns the whole response
+        # row, generated columns included, in the same roundtrip
+        new_block = (await run_in_threadpool(db.execute, insert(TimeBlock).values(
+            user_id=current_user.id, **block_fields
+        ).returning(*TIME_BLOCK_RESPONSE_COLUMNS))).one()
+        response = TimeBlockResponse.model_validate(new_block._mapping)
+        await run_in_threadpool(db.commit)
         
-        db.add(new_block)
-        db.commit()
-        db.refresh(new_block)
-        
-        # Sync to Google Calendar if enabled
-        if (sync_to_google and current_user.google_calendar_connected 
-            and current_user.google_calendar_sync_enabled):
-            
-            event_id = google_calendar_service.create_google_event(current_user, new_block)
-            if event_id:
-                new_block.google_calendar_event_id = event_id
-                new_block.sync_status = 'synced'
-                new_block.last_synced_at = datetime.utcnow()
-            else:
-                new_block.sync_status = 'error'
-                new_block.sync_error = 'Failed to sync to Google Calendar'
-            
-            db.commit()
+        # Sync to Google Calendar after the response; the block reports
+        # sync_status 'pending' until the background push records the outcome
+        if block_fields["google_calendar_sync_enabled"] and current_user.google_calendar_sync_enabled:
+            background_tasks.add_task(
+                google_calendar_service.push_time_block_in_background, current_user.id, response.id
+            )
         
-        return new_block
+        return response
         
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=500, detail=f"Failed to create time block: {str(e)}")
 
 @router.put("/time-blocks/{time_block_id}", response_model=TimeBlockResponse)
 async def update_time_block(
-    time_block_id: str,
-    time_block_data: dict,
+    time_block_id: ResourceIdPath,
+    time_block_data: TimeBlockUpdate,
+    background_tasks: BackgroundTasks,
     sync_to_google: bool = Query(True),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update time block with optional Google Calendar sync"""
     # Get time block
-    time_block = db.query(TimeBlock).filter(
-        TimeBlock.id == time_block_id,
-        TimeBlock.user_id == current_user.id
-    ).first()
+    time_block = await run_in_threadpool(get_owned_time_block, db, time_block_id, current_user.id)
     
     if not time_block:
         raise HTTPException(status_code=404, detail="Time block not found")
     
     try:
-        # Update fields
-        for field, value in time_block_data.items():
-            if field in ['start_time', 'end_time']:
-                setattr(time_block, field, datetime.fromisoformat(value))
-            elif hasattr(time_block, field):
-                setattr(time_block, field, value)
+        # Update only the fields the client sent
+        for field, value in time_block_data.model_dump(exclude_unset=True).items():
+            setattr(time_block, field, value)
         
         time_block.updated_at = datetime.utcnow()
         
-        # Sync to Google Calendar if enabled
-        if (sync_to_google and current_user.google_calendar_connected 
-            and current_user.google_calendar_sync_enabled
-            and time_block.google_calendar_sync_enabled):
-            
-            success = google_calendar_service.update_google_event(current_user, time_block)
-            if success:
-                time_block.sync_status = 'synced'
-                time_block.last_synced_at = datetime.utcnow()
-                time_block.sync_error = None
-            else:
-                time_block.sync_status = 'error'
-                time_block.sync_error = 'Failed to update in Google Calendar'
+        # Sync to Google Calendar after the response (see create_time_block)
+        push_to_google = (sync_to_google and current_user.google_calendar_connected 
+                          and current_user.google_calendar_sync_enabled
+                          and time_block.google_calendar_sync_enabled)
+        if push_to_google:
+            time_block.sync_status = 'pending'
+        
+        # Build the response before commit expires the instance
+        response = TimeBlockResponse.model_validate(time_block)
+        await run_in_threadpool(db.commit)
+        
+        if push_to_google:
+            background_tasks.add_task(
+                google_calendar_service.push_time_block_in_background, current_user.id, time_block_id
+            )
         
-        db.commit()
-        return time_block
+        return response
         
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=500, detail=f"Failed to update time block: {str(e)}")
 
 @router.delete("/time-blocks/{time_block_id}")
 async def delete_time_block(
-    time_block_id: str,
+    time_block_id: ResourceIdPath,
     delete_from_google: bool = Query(True),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete time block with optional Google Calendar sync"""
     # Get time block
-    time_block = db.query(TimeBlock).filter(
-        TimeBlock.id == time_block_id,
-        TimeBlock.user_id == current_user.id
-    ).first()
+    time_block = await run_in_threadpool(get_owned_time_block, db, time_block_id, current_user.id)
     
     if not time_block:
         raise HTTPException(status_code=404, detail="Time block not found")
@@ -280,17 +366,19 @@ async def delete_time_block(
         if (delete_from_google and current_user.google_calendar_connected 
             and time_block.google_calendar_event_id):
             
-            google_calendar_service.delete_google_event(
+            await google_calendar_service.run_blocking(
+                google_calendar_service.delete_google_event,
                 current_user, 
-                time_block.google_calendar_event_id
+                time_block.google_calendar_event_id,
+                db
             )
         
         # Delete from database
         db.delete(time_block)
-        db.commit()
+        await run_in_threadpool(db.commit)
         
         return {"message": "Time block deleted successfully"}
         
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=500, detail=f"Failed to delete time block: {str(e)}")
\ No newline at end of file
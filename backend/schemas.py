@@ -4,8 +4,26 @@ Request/response models for API endpoints
 """
 
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, Literal, Optional, List, Dict, Any
+from fastapi import Path
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, StringConstraints
+
+# Resource ids are UUID columns; reject anything else before it reaches the database
+UUID_PATTERN = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+ResourceId = Annotated[str, StringConstraints(pattern=UUID_PATTERN)]
+ResourceIdPath = Annotated[str, Path(pattern=UUID_PATTERN)]
+
+# Closed value sets are Literals (a set lookup in pydantic-core, no regex);
+# only the free-form hex color still needs a pattern
+HEX_COLOR_PATTERN = r"^#[0-9A-Fa-f]{6}$"
+HexColor = Annotated[str, StringConstraints(pattern=HEX_COLOR_PATTERN)]
+TaskPriority = Literal["low", "medium", "high"]
+TaskStatus = Literal["pending", "in_progress", "completed"]
+BlockType = Literal["work", "personal", "rest", "focus", "external"]
+FocusSessionType = Literal["pomodoro", "custom"]
+TimeOfDay = Literal["morning", "afternoon", "evening"]
+InputMethod = Literal["tap", "voice", "emoji"]
+ConversationType = Literal["general", "productivity", "mood", "planning"]
 
 # Authentication schemas
 class UserRegister(BaseModel):
@@ -26,8 +44,7 @@ class UserResponse(BaseModel):
     google_calendar_sync_enabled: bool = False
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Token(BaseModel):
     access_token: str
@@ -40,7 +57,7 @@ class TaskCreate(BaseModel):
     description: Optional[str] = None
     scheduled_start: Optional[datetime] = None
     scheduled_end: Optional[datetime] = None
-    priority: str = Field("medium", pattern="^(low|medium|high)$")
+    priority: TaskPriority = "medium"
     category: Optional[str] = Field(None, max_length=50)
 
 class TaskUpdate(BaseModel):
@@ -48,8 +65,8 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     scheduled_start: Optional[datetime] = None
     scheduled_end: Optional[datetime] = None
-    status: Optional[str] = Field(None, pattern="^(pending|in_progress|completed)$")
-    priority: Optional[str] = Field(None, pattern="^(low|medium|high)$")
+    status: Optional[TaskStatus] = None
+    priority: Optional[TaskPriority] = None
     category: Optional[str] = Field(None, max_length=50)
     completion_percentage: Optional[int] = Field(None, ge=0, le=100)
     is_broken_down: Optional[bool] = None
@@ -71,8 +88,7 @@ class TaskResponse(BaseModel):
     updated_at: datetime
     completed_at: Optional[datetime]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Time Block schemas
 class TimeBlockCreate(BaseModel):
@@ -82,11 +98,11 @@ class TimeBlockCreate(BaseModel):
     start_time: datetime
     end_time: datetime
     all_day: bool = False
-    block_type: str = Field("work", pattern="^(work|personal|rest|focus|external)$")
-    color: str = Field("#4A90E2", pattern="^#[0-9A-Fa-f]{6}$")
+    block_type: BlockType = "work"
+    color: HexColor = "#4A90E2"
     is_flexible: bool = False
     buffer_time_minutes: int = Field(10, ge=0, le=60)
-    linked_task_id: Optional[str] = None
+    linked_task_id: Optional[ResourceId] = None
     google_calendar_sync_enabled: bool = True
 
 class TimeBlockUpdate(BaseModel):
@@ -96,11 +112,11 @@ class TimeBlockUpdate(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     all_day: Optional[bool] = None
-    block_type: Optional[str] = Field(None, pattern="^(work|personal|rest|focus|external)$")
-    color: Optional[str] = Field(None, pattern="^#[0-9A-Fa-f]{6}$")
+    block_type: Optional[BlockType] = None
+    color: Optional[HexColor] = None
     is_flexible: Optional[bool] = None
     buffer_time_minutes: Optional[int] = Field(None, ge=0, le=60)
-    linked_task_id: Optional[str] = None
+    linked_task_id: Optional[ResourceId] = None
     google_calendar_sync_enabled: Optional[bool] = None
 
 class TimeBlockResponse(BaseModel):
@@ -124,13 +140,12 @@ class TimeBlockResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Focus Session schemas
 class FocusSessionCreate(BaseModel):
     task_id: Optional[str] = None
-    session_type: str = Field("pomodoro", pattern="^(pomodoro|custom)$")
+    session_type: FocusSessionType = "pomodoro"
     planned_duration: int = Field(..., ge=5, le=480)  # 5 minutes to 8 hours
 
 class FocusSessionUpdate(BaseModel):
@@ -154,16 +169,15 @@ class FocusSessionResponse(BaseModel):
     productivity_rating: Optional[int]
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Mood Energy Log schemas
 class MoodEnergyLogCreate(BaseModel):
     mood_rating: int = Field(..., ge=1, le=5)
     energy_level: int = Field(..., ge=1, le=5)
     notes: Optional[str] = None
-    time_of_day: str = Field("morning", pattern="^(morning|afternoon|evening)$")
-    input_method: str = Field("tap", pattern="^(tap|voice|emoji)$")
+    time_of_day: TimeOfDay = "morning"
+    input_method: InputMethod = "tap"
 
 class MoodEnergyLogResponse(BaseModel):
     id: str
@@ -175,13 +189,12 @@ class MoodEnergyLogResponse(BaseModel):
     input_method: str
     logged_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Chat schemas
 class ChatMessage(BaseModel):
     message: str = Field(..., max_length=2000)
-    conversation_type: str = Field("general", pattern="^(general|productivity|mood|planning)$")
+    conversation_type: ConversationType = "general"
 
 class ChatResponse(BaseModel):
     id: str
@@ -191,8 +204,7 @@ class ChatResponse(BaseModel):
     session_id: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Google Calendar schemas
 class CalendarSyncStatus(BaseModel):
@@ -203,6 +215,9 @@ class CalendarSyncStatus(BaseModel):
 class CalendarAuthResponse(BaseModel):
     auth_url: str
 
+class TimeBlockBatchSync(BaseModel):
+    time_block_ids: List[ResourceId] = Field(..., min_length=1, max_length=500)
+
 # Error schemas
 class ErrorResponse(BaseModel):
     detail: str
@@ -5,19 +5,141 @@ Security-first implementation with GDPR compliance
 
 import os
 import hashlib
+import time
 import secrets
+import functools
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 import bcrypt
-from jose import jwt
-from cryptography.fernet import Fernet
+from cachetools import TTLCache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import jwt
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
+import orjson
+import structlog
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session, undefer, undefer_group
+
+from database import SessionLocal, get_db
+from models import User, SecurityAuditLog, Conversation, MoodEnergyLog, Task, TimeBlock, FocusSession, JournalEntry
+
+logger = structlog.get_logger()
+
+class UserCipher:
+    """
+    AES-256-GCM with one user's key, storing raw version || nonce || ciphertext || tag.
+    Still reads the Fernet tokens written before the switch, trying each
+    older key in turn; those keys are only derived if such data turns up.
+    """
+    
+    # First byte of an AES-GCM token. Fernet tokens are base64 text and
+    # always start with "g", so the two formats cannot be confused.
+    AESGCM_VERSION = b"\x01"
+    NONCE_SIZE = 12
+    
+    def __init__(self, aead: AESGCM, *derive_fernet_keys):
+        self._aead = aead
+        self._derive_fernet_keys = derive_fernet_keys
+        self._fernets: List[Optional[Fernet]] = [None] * len(derive_fernet_keys)
+    
+    def encrypt(self, data: bytes) -> bytes:
+        nonce = os.urandom(self.NONCE_SIZE)
+        return self.AESGCM_VERSION + nonce + self._aead.encrypt(nonce, data, None)
+    
+    def decrypt(self, token: bytes) -> bytes:
+        if token[:1] == self.AESGCM_VERSION:
+            nonce_end = 1 + self.NONCE_SIZE
+            try:
+                return self._aead.decrypt(token[1:nonce_end], token[nonce_end:], None)
+            except (InvalidTag, ValueError):
+                raise InvalidToken
+        
+        for index, derive_key in enumerate(self._derive_fernet_keys):
+            fernet = self._fernets[index]
+            if fernet is None:
+                fernet = self._fernets[index] = Fernet(derive_key())
+            try:
+                return fernet.decrypt(token)
+            except InvalidToken:
+                continue
+        raise InvalidToken
+    
+    def encrypt_text(self, content: str) -> bytes:
+        return self.encrypt(content.encode())
+    
+    def decrypt_text(self, encrypted_content: bytes) -> str:
+        return self.decrypt(encrypted_content).decode()
+    
+    def decrypt_texts(self, tokens: List[bytes]) -> List[Optional[str]]:
+        """Decrypt many texts in order; any that fail to decrypt become None"""
+        decrypt = self.decrypt
+        texts: List[Optional[str]] = []
+        for token in tokens:
+            try:
+                texts.append(decrypt(token).decode())
+            except (InvalidToken, UnicodeDecodeError):
+                texts.append(None)
+        return texts
+    
+    def encrypt_fields(self, fields: Dict[str, Optional[str]]) -> Dict[str, Optional[bytes]]:
+        """Encrypt several text fields; None stays None"""
+        return {
+            name: self.encrypt(value.encode()) if value is not None else None
+            for name, value in fields.items()
+        }
+    
+    def decrypt_fields(self, fields: Dict[str, Optional[bytes]]) -> Dict[str, Optional[str]]:
+        """Decrypt several fields; empty values become None"""
+        return {
+            name: self.decrypt(value).decode() if value else None
+            for name, value in fields.items()
+        }
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Snapshot of the user fields authenticated endpoints rely on"""
+    id: str
+    username: str
+    encryption_salt: bytes
+    is_active: bool
+    # Derived once when the snapshot is taken, so endpoints encrypt and
+    # decrypt without going back through the key cache
+    cipher: UserCipher = field(repr=False, compare=False)
+
+# Authenticated user snapshots by id, so repeat requests skip the user lookup.
+# Evict an entry after writing to or deleting that user's row.
+_user_cache = TTLCache(maxsize=10000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+def get_cached_user(user_id: str) -> Optional[CachedUser]:
+    """Return the cached snapshot for a user, if any"""
+    with _user_cache_lock:
+        return _user_cache.get(user_id)
+
+def cache_user(user_id: str, user: CachedUser):
+    """Cache a user snapshot under its id"""
+    with _user_cache_lock:
+        _user_cache[user_id] = user
+
+def evict_cached_user(user_id: str):
+    """Drop a user's cached snapshot so the next request reloads the row"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
 
 class DataEncryptionService:
     """
@@ -25,50 +147,146 @@ class DataEncryptionService:
     Uses per-user encryption keys derived from master key + user salt.
     """
     
+    # Number of derived user keys kept in memory, and how long each may outlive
+    # a salt or master key rotation
+    KEY_CACHE_SIZE = 4096
+    KEY_CACHE_TTL_SECONDS = 900
+    # Number of email index hashes kept in memory
+    EMAIL_HASH_CACHE_SIZE = 2048
+    
     def __init__(self):
         self.master_key = os.getenv('DATA_ENCRYPTION_MASTER_KEY')
         if not self.master_key:
             raise ValueError("DATA_ENCRYPTION_MASTER_KEY environment variable required")
+        
+        # Derive once per user and salt; the legacy PBKDF2 key is deliberately slow
+        self._cipher_cache = TTLCache(maxsize=self.KEY_CACHE_SIZE, ttl=self.KEY_CACHE_TTL_SECONDS)
+        self._cipher_cache_lock = threading.Lock()
+        self._index_key = hashlib.blake2b(self.master_key.encode(), person=b"sol-os:index").digest()
+        # Logins for the same address repeat, and the hash is deterministic
+        self._hash_email = functools.lru_cache(maxsize=self.EMAIL_HASH_CACHE_SIZE)(self._compute_email_hash)
     
     def generate_user_salt(self) -> bytes:
         """Generate random salt for new user"""
         return secrets.token_bytes(32)
     
     def derive_user_key(self, user_id: str, user_salt: bytes) -> bytes:
-        """Derive unique encryption key for each user"""
+        """Derive unique AES-256-GCM encryption key for each user"""
+        # The master key is a high-entropy server secret, not a password, so
+        # there is nothing for a slow KDF to protect; one HKDF expansion per
+        # user is enough to separate keys
+        return self._expand_user_key(user_id, user_salt, f"sol-os:user:{user_id}:aes-gcm")
+    
+    def derive_fernet_user_key(self, user_id: str, user_salt: bytes) -> bytes:
+        """HKDF Fernet key that data encrypted before the AES-GCM switch was written with"""
+        return base64.urlsafe_b64encode(
+            self._expand_user_key(user_id, user_salt, f"sol-os:user:{user_id}")
+        )
+    
+    def _expand_user_key(self, user_id: str, user_salt: bytes, info: str) -> bytes:
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=user_salt,
+            info=info.encode(),
+        )
+        return hkdf.derive(self.master_key.encode())
+    
+    def derive_legacy_user_key(self, user_id: str, user_salt: bytes) -> bytes:
+        """PBKDF2 key that data encrypted before the HKDF switch was written with"""
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
             salt=user_salt,
-            iterations=100000,  # High iteration count for security
+            iterations=100000,
         )
         key = base64.urlsafe_b64encode(kdf.derive(
             f"{self.master_key}:{user_id}".encode()
         ))
         return key
     
+    def get_cipher(self, user_id: str, user_salt: bytes) -> "UserCipher":
+        """Cipher for a user's derived key, derived on first use"""
+        # Keyed by a digest of the salt so raw salts are not held in memory
+        cache_key = (user_id, hashlib.blake2b(user_salt, digest_size=16).digest())
+        with self._cipher_cache_lock:
+            cipher = self._cipher_cache.get(cache_key)
+        if cipher is None:
+            cipher = UserCipher(
+                AESGCM(self.derive_user_key(user_id, user_salt)),
+                functools.partial(self.derive_fernet_user_key, user_id, user_salt),
+                functools.partial(self.derive_legacy_user_key, user_id, user_salt)
+            )
+            with self._cipher_cache_lock:
+                self._cipher_cache[cache_key] = cipher
+        return cipher
+    
+    def evict_user_keys(self, user_id: str):
+        """Drop a user's cached keys, e.g. once their data is deleted"""
+        with self._cipher_cache_lock:
+            for cache_key in [k for k in self._cipher_cache.keys() if k[0] == user_id]:
+                self._cipher_cache.pop(cache_key, None)
+    
     def encrypt_text(self, user_id: str, user_salt: bytes, content: str) -> bytes:
         """Encrypt text content with user-specific key"""
-        user_key = self.derive_user_key(user_id, user_salt)
-        fernet = Fernet(user_key)
-        return fernet.encrypt(content.encode())
+        return self.get_cipher(user_id, user_salt).encrypt_text(content)
     
     def decrypt_text(self, user_id: str, user_salt: bytes, encrypted_content: bytes) -> str:
         """Decrypt text content"""
-        user_key = self.derive_user_key(user_id, user_salt)
-        fernet = Fernet(user_key)
-        decrypted_content = fernet.decrypt(encrypted_content)
-        return decrypted_content.decode()
+        return self.get_cipher(user_id, user_salt).decrypt_text(encrypted_content)
+    
+    def decrypt_text_batch(self, user_id: str, user_salt: bytes, tokens: List[bytes]) -> List[Optional[str]]:
+        """Decrypt many texts with one key lookup; any that fail become None"""
+        return self.get_cipher(user_id, user_salt).decrypt_texts(tokens)
+    
+    def encrypt_fields(
+        self, user_id: str, user_salt: bytes, fields: Dict[str, Optional[str]]
+    ) -> Dict[str, Optional[bytes]]:
+        """Encrypt several text fields with one key lookup; None stays None"""
+        return self.get_cipher(user_id, user_salt).encrypt_fields(fields)
+    
+    def decrypt_fields(
+        self, user_id: str, user_salt: bytes, fields: Dict[str, Optional[bytes]]
+    ) -> Dict[str, Optional[str]]:
+        """Decrypt several fields with one key lookup; empty values become None"""
+        return self.get_cipher(user_id, user_salt).decrypt_fields(fields)
     
     def hash_email_for_index(self, email: str) -> str:
         """Create hash of email for database indexing while preserving privacy"""
+        return self._hash_email(email)
+    
+    def hash_for_index(self, value: str) -> str:
+        """Keyed 128-bit BLAKE2b of a value, for lookups and pseudonymous audit ids"""
+        # Keyed with a server secret, so the index cannot be reversed by
+        # hashing candidate addresses offline
+        return hashlib.blake2b(value.encode(), digest_size=16, key=self._index_key).hexdigest()
+    
+    @staticmethod
+    def legacy_email_hash(email: str) -> str:
+        """Unkeyed SHA-256 email hash that accounts created before BLAKE2b still carry"""
         return hashlib.sha256(email.lower().encode()).hexdigest()
+    
+    def _compute_email_hash(self, email: str) -> str:
+        return self.hash_for_index(email.lower())
 
 class SecureAuthService:
     """
     Security-first authentication with enhanced JWT implementation.
     """
     
+    # Threads argon2 uses for a single hash
+    PASSWORD_HASH_LANES = 2
+    
+    # Verified token payloads kept in memory, and for how long
+    VERIFIED_TOKEN_CACHE_SIZE = 10000
+    VERIFIED_TOKEN_CACHE_TTL_SECONDS = 30
+    
+    # Cache entry for a token whose signature was valid but which has expired
+    _EXPIRED = object()
+    
+    # Claims every token we issue carries; the cached path reads "exp"
+    REQUIRED_TOKEN_CLAIMS = ["exp", "sub", "type"]
+    
     def __init__(self):
         self.secret_key = os.getenv('JWT_SECRET_KEY')
         if not self.secret_key:
@@ -78,59 +296,188 @@ class SecureAuthService:
         self.access_token_expire_minutes = 15  # Short-lived access tokens
         self.refresh_token_expire_days = 30    # Longer refresh tokens
         
+        # Recently verified payloads keyed by token digest
+        self._verified_tokens = TTLCache(
+            maxsize=self.VERIFIED_TOKEN_CACHE_SIZE, ttl=self.VERIFIED_TOKEN_CACHE_TTL_SECONDS
+        )
+        self._verified_tokens_lock = threading.Lock()
+        
+        # Token ids only need to be unique, and tokens are issued on every
+        # login, so they come from a pre-read random buffer
+        self._jti_pool = RandomTokenPool()
+        
+        # argon2id - memory-hard, cheaper per verify than bcrypt at 12 rounds.
+        # Two lanes let one hash use two cores, halving a lone login's latency
+        # at the same work factor
+        self.password_hasher = PasswordHasher(
+            time_cost=2, memory_cost=65536, parallelism=self.PASSWORD_HASH_LANES
+        )
+        
+        # Hashing is CPU-bound (and releases the GIL), so it gets its own pool
+        # sized so concurrent hashes' lanes fill the cores without
+        # oversubscribing them, instead of competing with database calls in
+        # the default threadpool during login bursts
+        self._password_executor = ThreadPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 1) // self.PASSWORD_HASH_LANES),
+            thread_name_prefix="password-hash"
+        )
+        
     def hash_password(self, password: str) -> str:
-        """Hash password with bcrypt and high cost factor"""
-        salt = bcrypt.gensalt(rounds=12)  # High cost for security
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash password with argon2id"""
+        return self.password_hasher.hash(password)
     
     def verify_password(self, password: str, hashed: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        """Verify password against an argon2id or legacy bcrypt hash"""
+        if hashed.startswith("$2"):
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        try:
+            return self.password_hasher.verify(hashed, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    def password_needs_rehash(self, hashed: str) -> bool:
+        """Whether a verified hash should be replaced with current parameters"""
+        return hashed.startswith("$2") or self.password_hasher.check_needs_rehash(hashed)
+    
+    async def hash_password_async(self, password: str) -> str:
+        """hash_password on the password pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._password_executor, self.hash_password, password)
+    
+    async def verify_password_async(self, password: str, hashed: str) -> bool:
+        """verify_password on the password pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._password_executor, self.verify_password, password, hashed)
     
     def create_access_token(self, user_id: str, permissions: list = None) -> str:
         """Create short-lived access token"""
+        # JWT times are epoch seconds; one clock read covers both claims
+        now = int(time.time())
         payload = {
             "sub": user_id,
             "type": "access",
             "permissions": permissions or [],
-            "exp": datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes),
-            "iat": datetime.utcnow(),
-            "jti": secrets.token_urlsafe(16)  # Unique token ID for revocation
+            "exp": now + self.access_token_expire_minutes * 60,
+            "iat": now,
+            "jti": self._jti_pool.token_hex()  # Unique token ID for revocation
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
     
     def create_refresh_token(self, user_id: str) -> str:
         """Create long-lived refresh token"""
+        now = int(time.time())
         payload = {
             "sub": user_id,
             "type": "refresh",
-            "exp": datetime.utcnow() + timedelta(days=self.refresh_token_expire_days),
-            "iat": datetime.utcnow(),
-            "jti": secrets.token_urlsafe(16)
+            "exp": now + self.refresh_token_expire_days * 86400,
+            "iat": now,
+            "jti": self._jti_pool.token_hex()
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
     
     def verify_token(self, token: str) -> Dict[str, Any]:
         """Verify and decode JWT token"""
+        # Clients resend the same bearer token on every request, so a recent
+        # successful verification is reused; expiry is still enforced
+        token_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with self._verified_tokens_lock:
+            payload = self._verified_tokens.get(token_key)
+        if payload is not None and payload is not self._EXPIRED and payload["exp"] > time.time():
+            return payload
+        
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            if payload is not None:
+                # Expired since it was cached, or already known to be expired
+                raise jwt.ExpiredSignatureError()
+            payload = jwt.decode(
+                token, self.secret_key, algorithms=[self.algorithm],
+                options={"require": self.REQUIRED_TOKEN_CLAIMS}
+            )
+            with self._verified_tokens_lock:
+                self._verified_tokens[token_key] = payload
             return payload
         except jwt.ExpiredSignatureError:
+            # An expired token never becomes valid again, so clients retrying
+            # with it skip the signature check too
+            with self._verified_tokens_lock:
+                self._verified_tokens[token_key] = self._EXPIRED
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired"
             )
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
 
+# Audit events are queued and written in batches - one transaction per
+# AUDIT_BUFFER_SIZE events or AUDIT_FLUSH_INTERVAL seconds, whichever is first
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "5"))
+_audit_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+_audit_writer: Optional[asyncio.Task] = None
+
+def _write_audit_events(events: list):
+    """Insert a batch of audit rows in one transaction"""
+    db = SessionLocal()
+    try:
+        db.execute(insert(SecurityAuditLog), events)
+        db.commit()
+    finally:
+        db.close()
+
+async def _flush_audit_events(events: list):
+    try:
+        await asyncio.to_thread(_write_audit_events, events)
+    except Exception as e:
+        logger.error("Failed to write audit events", count=len(events), error=str(e))
+
+async def _run_audit_writer():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _audit_queue.get()]
+        deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+        try:
+            while len(batch) < AUDIT_BUFFER_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(_audit_queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped mid-batch: these events are already off the queue
+            await _flush_audit_events(batch)
+            raise
+        await _flush_audit_events(batch)
+
+def start_audit_writer():
+    """Start batching audit events; call from the app's startup"""
+    global _audit_writer
+    _audit_writer = asyncio.create_task(_run_audit_writer())
+
+async def stop_audit_writer():
+    """Stop the writer and persist anything still queued"""
+    global _audit_writer
+    if _audit_writer is not None:
+        _audit_writer.cancel()
+        # Let it finish writing a batch it had started
+        await asyncio.gather(_audit_writer, return_exceptions=True)
+        _audit_writer = None
+    remaining = []
+    while not _audit_queue.empty():
+        remaining.append(_audit_queue.get_nowait())
+    if remaining:
+        await _flush_audit_events(remaining)
+
 class SecurityAuditService:
     """
     Security event monitoring and audit logging.
     """
     
+    # Events check_failed_login_attempts counts. They are written at once,
+    # never queued, so a burst of bad logins is seen by the very next check
+    UNBATCHED_EVENT_TYPES = frozenset({"login_failed"})
+    
     def __init__(self, db: Session):
         self.db = db
     
@@ -142,34 +489,43 @@ class SecurityAuditService:
         user_agent: Optional[str] = None,
         success: bool = True,
         event_details: Dict[str, Any] = None,
-        risk_level: str = "low"
+        risk_level: str = "low",
+        email_hash: Optional[str] = None
     ):
         """Log security event for audit trail"""
-        from models import SecurityAuditLog
+        event = {
+            "event_type": event_type,
+            "user_id": user_id,
+            "email_hash": email_hash,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "success": success,
+            "event_details": event_details or {},
+            "risk_level": risk_level,
+            "timestamp": datetime.utcnow(),
+        }
         
-        audit_log = SecurityAuditLog(
-            event_type=event_type,
-            user_id=user_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            success=success,
-            event_details=event_details or {},
-            risk_level=risk_level
-        )
+        # Queued for the batch writer when it runs; otherwise (scripts, or
+        # before startup) written straight away as before
+        if (
+            event_type not in self.UNBATCHED_EVENT_TYPES
+            and _audit_writer is not None and not _audit_writer.done()
+        ):
+            _audit_queue.put_nowait(event)
+            return
         
-        self.db.add(audit_log)
-        self.db.commit()
+        self.db.add(SecurityAuditLog(**event))
+        await asyncio.to_thread(self.db.commit)
     
-    async def check_failed_login_attempts(self, email: str, ip_address: str) -> bool:
+    async def check_failed_login_attempts(self, email_hash: str, ip_address: str) -> bool:
         """Check if account should be locked due to failed login attempts"""
-        from models import SecurityAuditLog
-        
+        # email_hash is DataEncryptionService.hash_email_for_index of the address
         # Check failed login attempts in last 15 minutes
-        recent_failures = self.db.query(SecurityAuditLog).filter(
+        recent_failures = await asyncio.to_thread(self.db.query(SecurityAuditLog).filter(
             SecurityAuditLog.event_type == "login_failed",
-            SecurityAuditLog.timestamp > datetime.utcnow() - timedelta(minutes=15),
-            SecurityAuditLog.event_details.contains({"email_hash": hashlib.sha256(email.encode()).hexdigest()})
-        ).count()
+            SecurityAuditLog.email_hash == email_hash,
+            SecurityAuditLog.timestamp > datetime.utcnow() - timedelta(minutes=15)
+        ).count)
         
         return recent_failures >= 5  # Lock after 5 failed attempts
 
@@ -178,52 +534,67 @@ class ConsentManager:
     GDPR-compliant consent management for different data uses.
     """
     
+    consent_types = {
+        "conversation_storage": "Store conversation history for personalized experience",
+        "mood_analysis": "Analyze mood/energy patterns for insights",
+        "productivity_optimization": "Use data to optimize productivity recommendations",
+        "analytics_anonymous": "Anonymous usage analytics for service improvement",
+        "third_party": "Integrate with external services (future: Notion, Calendar)"
+    }
+    
+    # User column holding each consent, resolved once instead of per call
+    _consent_columns = {consent_type: getattr(User, f"consent_{consent_type}") for consent_type in consent_types}
+    
     def __init__(self, db: Session):
         self.db = db
-        self.consent_types = {
-            "conversation_storage": "Store conversation history for personalized experience",
-            "mood_analysis": "Analyze mood/energy patterns for insights",
-            "productivity_optimization": "Use data to optimize productivity recommendations",
-            "analytics_anonymous": "Anonymous usage analytics for service improvement",
-            "third_party": "Integrate with external services (future: Notion, Calendar)"
-        }
     
     async def check_consent(self, user_id: str, consent_type: str) -> bool:
         """Check if user has given consent for specific data use"""
-        from models import User
-        
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+        column = self._consent_columns.get(consent_type)
+        if column is None:
             return False
         
-        consent_field = f"consent_{consent_type}"
-        return getattr(user, consent_field, False)
+        # Only the one flag is needed, not the whole user row
+        granted = self.db.execute(select(column).where(User.id == user_id)).scalar()
+        return bool(granted)
     
     async def update_consent(self, user_id: str, consent_updates: Dict[str, bool]):
         """Update user consent preferences"""
-        from models import User
+        # Unknown consent types are ignored
+        changes = {
+            consent_type: granted for consent_type, granted in consent_updates.items()
+            if consent_type in self._consent_columns
+        }
         
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if changes:
+            # One UPDATE of just the consent columns; no row means no user
+            found = self.db.execute(
+                update(User).where(User.id == user_id).values({
+                    self._consent_columns[consent_type]: granted
+                    for consent_type, granted in changes.items()
+                })
+            ).rowcount > 0
+        else:
+            found = self.db.execute(select(User.id).where(User.id == user_id)).first() is not None
+        if not found:
             raise HTTPException(status_code=404, detail="User not found")
         
-        for consent_type, granted in consent_updates.items():
-            consent_field = f"consent_{consent_type}"
-            if hasattr(user, consent_field):
-                setattr(user, consent_field, granted)
-                
-                # Log consent change for audit
-                await SecurityAuditService(self.db).log_security_event(
-                    event_type="consent_change",
-                    user_id=user_id,
-                    event_details={
-                        "consent_type": consent_type,
-                        "granted": granted
-                    }
-                )
+        for consent_type, granted in changes.items():
+            # Log consent change for audit
+            await SecurityAuditService(self.db).log_security_event(
+                event_type="consent_change",
+                user_id=user_id,
+                event_details={
+                    "consent_type": consent_type,
+                    "granted": granted
+                }
+            )
         
         self.db.commit()
 
+# Export timestamps are naive UTC; mark them as such, one record per line
+EXPORT_JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE
+
 class GDPRComplianceService:
     """
     GDPR compliance service handling data subject rights.
@@ -233,165 +604,274 @@ class GDPRComplianceService:
         self.db = db
         self.encryption = encryption_service
     
-    async def export_user_data(self, user_id: str) -> Dict[str, Any]:
-        """Export all user data in machine-readable format (Right to Data Portability)"""
-        from models import User, Conversation, MoodEnergyLog, Task, TimeBlock, FocusSession
-        
-        user = self.db.query(User).filter(User.id == user_id).first()
+    # Rows fetched per round trip while exporting a collection
+    EXPORT_BATCH_SIZE = 200
+    
+    # Export sections that hold one record per row
+    EXPORT_LIST_SECTIONS = ("conversations", "mood_energy_logs", "tasks", "time_blocks", "focus_sessions")
+    
+    def iter_user_data(self, user_id: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        All of a user's exportable data as (section, record) pairs. Rows are
+        read in batches and yielded one at a time, so nothing holds the whole
+        export. Raises 404 immediately if the user does not exist.
+        """
+        user = self.db.query(User).options(undefer(User.email_encrypted)).filter(User.id == user_id).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
+        return self._iter_user_records(user)
+    
+    def _iter_user_records(self, user) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        user_id = str(user.id)
+        cipher = self.encryption.get_cipher(user_id, user.encryption_salt)
         
-        # Decrypt user email for export
-        email = self.encryption.decrypt_text(user_id, user.encryption_salt, user.email_encrypted)
+        yield "user_profile", {
+            "id": user_id,
+            "email": self._decrypt_email(user, cipher),
+            "username": user.username,
+            "created_at": user.created_at,
+            "data_retention_days": user.data_retention_days
+        }
+        yield "consent_preferences", {
+            "conversation_storage": user.consent_conversation_storage,
+            "mood_analysis": user.consent_mood_analysis,
+            "productivity_optimization": user.consent_productivity_optimization,
+            "analytics_anonymous": user.consent_analytics_anonymous,
+            "third_party": user.consent_third_party
+        }
         
-        # Collect conversations (decrypt for export)
-        conversations = []
-        for conv in user.conversations:
+        # Conversations are decrypted one batch at a time
+        conversations = self.db.query(Conversation).options(undefer_group("content")).filter(
+            Conversation.user_id == user_id
+        ).order_by(Conversation.created_at).yield_per(self.EXPORT_BATCH_SIZE)
+        for conv in conversations:
             try:
-                message = self.encryption.decrypt_text(user_id, user.encryption_salt, conv.message_content_encrypted)
-                response = self.encryption.decrypt_text(user_id, user.encryption_salt, conv.sol_response_encrypted)
-                conversations.append({
-                    "id": str(conv.id),
-                    "session_id": conv.session_id,
-                    "message": message,
-                    "sol_response": response,
-                    "created_at": conv.created_at.isoformat()
-                })
-            except Exception:
+                message = cipher.decrypt(conv.message_content_encrypted).decode()
+                response = cipher.decrypt(conv.sol_response_encrypted).decode()
+            except (InvalidToken, UnicodeDecodeError):
                 # Skip corrupted conversations
                 continue
-        
-        # Collect other data
-        user_data = {
-            "user_profile": {
-                "id": str(user.id),
-                "email": email,
-                "username": user.username,
-                "created_at": user.created_at.isoformat(),
-                "data_retention_days": user.data_retention_days
-            },
-            "consent_preferences": {
-                "conversation_storage": user.consent_conversation_storage,
-                "mood_analysis": user.consent_mood_analysis,
-                "productivity_optimization": user.consent_productivity_optimization,
-                "analytics_anonymous": user.consent_analytics_anonymous,
-                "third_party": user.consent_third_party
-            },
-            "conversations": conversations,
-            "mood_energy_logs": [
-                {
-                    "id": str(log.id),
-                    "mood_rating": log.mood_rating,
-                    "energy_level": log.energy_level,
-                    "time_of_day": log.time_of_day,
-                    "logged_at": log.logged_at.isoformat()
-                }
-                for log in user.mood_energy_logs
-            ],
-            "tasks": [
-                {
-                    "id": str(task.id),
-                    "title": task.title,
-                    "description": task.description,
-                    "status": task.status,
-                    "created_at": task.created_at.isoformat()
-                }
-                for task in user.tasks
-            ],
-            "time_blocks": [
-                {
-                    "id": str(block.id),
-                    "title": block.title,
-                    "start_time": block.start_time.isoformat(),
-                    "end_time": block.end_time.isoformat(),
-                    "block_type": block.block_type
-                }
-                for block in user.time_blocks
-            ],
-            "focus_sessions": [
-                {
-                    "id": str(session.id),
-                    "session_type": session.session_type,
-                    "planned_duration": session.planned_duration,
-                    "actual_duration": session.actual_duration,
-                    "started_at": session.started_at.isoformat()
-                }
-                for session in user.focus_sessions
-            ],
-            "export_metadata": {
-                "export_timestamp": datetime.utcnow().isoformat(),
-                "export_format": "JSON",
-                "data_retention_period": f"{user.data_retention_days} days",
-                "data_usage_purpose": "ADHD productivity support and AI companion services"
+            yield "conversations", {
+                "id": str(conv.id),
+                "session_id": conv.session_id,
+                "message": message,
+                "sol_response": response,
+                "created_at": conv.created_at
             }
-        }
         
+        # Everything else is exported as plain column rows
+        plain_sections = (
+            ("mood_energy_logs", MoodEnergyLog, (
+                MoodEnergyLog.id, MoodEnergyLog.mood_rating, MoodEnergyLog.energy_level,
+                MoodEnergyLog.time_of_day, MoodEnergyLog.logged_at
+            )),
+            ("tasks", Task, (Task.id, Task.title, Task.description, Task.status, Task.created_at)),
+            ("time_blocks", TimeBlock, (
+                TimeBlock.id, TimeBlock.title, TimeBlock.start_time, TimeBlock.end_time, TimeBlock.block_type
+            )),
+            ("focus_sessions", FocusSession, (
+                FocusSession.id, FocusSession.session_type, FocusSession.planned_duration,
+                FocusSession.actual_duration, FocusSession.started_at
+            )),
+        )
+        for section, model, columns in plain_sections:
+            rows = self.db.execute(
+                select(*columns).where(model.user_id == user_id),
+                execution_options={"yield_per": self.EXPORT_BATCH_SIZE}
+            ).mappings()
+            for row in rows:
+                yield section, dict(row)
+        
+        yield "export_metadata", {
+            "export_timestamp": datetime.utcnow(),
+            "export_format": "JSON",
+            "data_retention_period": f"{user.data_retention_days} days",
+            "data_usage_purpose": "ADHD productivity support and AI companion services"
+        }
+    
+    def _decrypt_email(self, user, cipher: UserCipher) -> str:
+        """The user's email; accounts registered before the fix were encrypted under their username"""
+        try:
+            return cipher.decrypt(user.email_encrypted).decode()
+        except InvalidToken:
+            username_cipher = self.encryption.get_cipher(user.username, user.encryption_salt)
+            return username_cipher.decrypt(user.email_encrypted).decode()
+    
+    async def export_user_data(self, user_id: str) -> Dict[str, Any]:
+        """Export all user data in machine-readable format (Right to Data Portability)"""
+        user_data: Dict[str, Any] = {section: [] for section in self.EXPORT_LIST_SECTIONS}
+        for section, record in self.iter_user_data(user_id):
+            if section in self.EXPORT_LIST_SECTIONS:
+                user_data[section].append(record)
+            else:
+                user_data[section] = record
         return user_data
     
+    def stream_user_data_ndjson(self, user_id: str) -> Iterator[bytes]:
+        """
+        The export as NDJSON, one {"type": section, ...} object per line.
+        The profile line is produced here, before any response starts, so a
+        user whose data cannot be read gets an error rather than a cut-off 200.
+        """
+        records = self.iter_user_data(user_id)
+        first = next(records)
+        return (
+            orjson.dumps({"type": section, **record}, option=EXPORT_JSON_OPTIONS)
+            for section, record in itertools.chain((first,), records)
+        )
+    
     async def request_data_deletion(self, user_id: str) -> bool:
         """Request user data deletion (Right to Erasure)"""
-        from models import User
-        
         user = self.db.query(User).filter(User.id == user_id).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Mark for deletion (allows for verification period)
-        user.data_deletion_requested = datetime.utcnow()
+        requested_at = datetime.utcnow()
+        user.data_deletion_requested = requested_at
         self.db.commit()
         
         # Log deletion request
         await SecurityAuditService(self.db).log_security_event(
             event_type="data_deletion_requested",
             user_id=user_id,
-            event_details={"requested_at": datetime.utcnow().isoformat()}
+            event_details={"requested_at": requested_at.isoformat()}
         )
         
         return True
     
     async def execute_data_deletion(self, user_id: str, verification_token: str) -> bool:
         """Permanently delete all user data after verification"""
-        from models import User
-        
         # Verify deletion request (simplified for MVP)
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user or not user.data_deletion_requested:
+        deletion_requested = self.db.execute(
+            select(User.data_deletion_requested).where(User.id == user_id)
+        ).scalar()
+        if not deletion_requested:
             raise HTTPException(status_code=400, detail="No valid deletion request found")
         
-        # Delete all user data (cascading deletes will handle related records)
-        self.db.delete(user)
+        # One bulk DELETE per table rather than loading and deleting every
+        # row through the ORM cascade. Explicit, since SQLite does not
+        # enforce the ON DELETE clauses; rows referencing tasks go first.
+        for model in (Conversation, MoodEnergyLog, TimeBlock, FocusSession, JournalEntry, Task):
+            self.db.execute(
+                delete(model).where(model.user_id == user_id),
+                execution_options={"synchronize_session": False}
+            )
+        # The audit trail is kept, detached from the account
+        self.db.execute(
+            update(SecurityAuditLog).where(SecurityAuditLog.user_id == user_id).values(user_id=None),
+            execution_options={"synchronize_session": False}
+        )
+        self.db.execute(
+            delete(User).where(User.id == user_id),
+            execution_options={"synchronize_session": False}
+        )
         self.db.commit()
+        self.encryption.evict_user_keys(user_id)
+        evict_cached_user(user_id)
+        # Imported here: sol_personality imports this module
+        from sol_personality import ConversationMemoryService
+        ConversationMemoryService.evict_user_sessions(user_id)
         
         # Log successful deletion (without personal data)
         await SecurityAuditService(self.db).log_security_event(
             event_type="data_deletion_completed",
             event_details={
-                "user_id_hash": hashlib.sha256(user_id.encode()).hexdigest(),
+                "user_id_hash": self.encryption.hash_for_index(user_id),
                 "deletion_timestamp": datetime.utcnow().isoformat()
             }
         )
         
         return True
 
+class TokenBucketRateLimiter:
+    """
+    In-process token bucket rate limiter keyed by user id.
+    Each key may burst up to capacity (default: the per-minute limit), then refills continuously.
+    """
+    
+    def __init__(self, requests_per_minute: int, capacity: Optional[int] = None, max_keys: int = 100_000):
+        self.capacity = float(capacity or requests_per_minute)
+        self.refill_per_second = requests_per_minute / 60.0
+        # A bucket idle long enough to refill completely is the same as no bucket,
+        # so entries expire after that and the map stays bounded by active users
+        self._buckets: TTLCache = TTLCache(maxsize=max_keys, ttl=self.capacity / self.refill_per_second)
+        self._lock = threading.Lock()
+    
+    def allow(self, key: str) -> bool:
+        """Take one token for key; False if the bucket is empty"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last_refill = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last_refill) * self.refill_per_second)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+class RandomTokenPool:
+    """
+    Hands out random hex tokens from a buffer refilled with one CSPRNG read per chunk.
+    Use for identifiers such as chat session ids, not for secrets.
+    """
+    
+    def __init__(self, chunk_size: int = 4096):
+        self._chunk_size = chunk_size
+        self._buffer = secrets.token_bytes(chunk_size)
+        self._position = 0
+        self._lock = threading.Lock()
+    
+    def token_hex(self, nbytes: int = 16) -> str:
+        """Next nbytes of the buffer as hex (never reused)"""
+        with self._lock:
+            if self._position + nbytes > self._chunk_size:
+                self._buffer = secrets.token_bytes(self._chunk_size)
+                self._position = 0
+            token = self._buffer[self._position:self._position + nbytes]
+            self._position += nbytes
+        return token.hex()
+
 # Utility functions for security
 def get_client_ip(request) -> str:
-    """Extract client IP address from request"""
-    forwarded = request.headers.get("X-Forwarded-For")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.client.host
+    """Extract client IP address from request (parsed once, then kept on request.state)"""
+    client_ip = getattr(request.state, "client_ip", None)
+    if client_ip is None:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            client_ip = forwarded.split(",", 1)[0].strip()
+        else:
+            client_ip = request.client.host
+        request.state.client_ip = client_ip
+    return client_ip
+
+# Character classes a password must cover, as bits of one mask
+_UPPER, _LOWER, _DIGIT, _SPECIAL = 1, 2, 4, 8
+_ALL_CLASSES = _UPPER | _LOWER | _DIGIT | _SPECIAL
+_SPECIAL_CHARACTERS = frozenset("!@#$%^&*()_+-=[]{}|;':\",./<>?")
+
+def _character_classes(c: str) -> int:
+    return (
+        (_UPPER if c.isupper() else 0)
+        | (_LOWER if c.islower() else 0)
+        | (_DIGIT if c.isdigit() else 0)
+        | (_SPECIAL if c in _SPECIAL_CHARACTERS else 0)
+    )
+
+# ASCII is looked up; other characters keep str's Unicode-aware checks
+_ASCII_CLASSES = {chr(code): _character_classes(chr(code)) for code in range(128)}
 
 def validate_password_strength(password: str) -> bool:
     """Validate password meets security requirements"""
     if len(password) < 8:
         return False
     
-    has_upper = any(c.isupper() for c in password)
-    has_lower = any(c.islower() for c in password)
-    has_digit = any(c.isdigit() for c in password)
-    has_special = any(c in "!@#$%^&*()_+-=[]{}|;':\",./<>?" for c in password)
-    
-    return has_upper and has_lower and has_digit and has_special
+    # One pass that stops as soon as every class has been seen
+    mask = 0
+    for c in password:
+        classes = _ASCII_CLASSES.get(c)
+        mask |= _character_classes(c) if classes is None else classes
+        if mask == _ALL_CLASSES:
+            return True
+    return False
 
 def generate_verification_token() -> str:
     """Generate secure verification token"""
@@ -403,16 +883,13 @@ auth_service = SecureAuthService()
 
 # Authentication dependency
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
 ):
     """Get current authenticated user"""
+    # Shares the request's session (FastAPI caches get_db per request),
+    # so a route that also depends on get_db opens only one Session
     try:
-        from database import get_db
-        from models import User
-        
-        # Get database session
-        db = next(get_db())
-        
         payload = auth_service.verify_token(credentials.credentials)
         user_id = payload.get("sub")
         
@@ -428,6 +905,4 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
-        )
-    finally:
-        db.close()
\ No newline at end of file
+        )
\ No newline at end of file
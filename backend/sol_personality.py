@@ -4,16 +4,142 @@ Existential, broody, thoughtful, and witty AI companion for ADHD users
 """
 
 import os
-import json
+import re
+import time
+import uuid
 import asyncio
-from typing import Dict, List, Optional, Any
+import hashlib
+import operator
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from types import MappingProxyType
+from typing import AsyncIterator, Deque, Dict, List, Mapping, Optional, Any, Tuple, Union
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
-from openai import AsyncOpenAI
+import httpx
+from cachetools import TTLCache
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+import structlog
 from fastapi import HTTPException
+from sqlalchemy import insert
 
-@dataclass
+from database import SessionLocal
+from models import Conversation, User
+from security import UserCipher
+
+# Sol's personality prompt. Sent verbatim as the first message of every
+# request - never formatted or extended - so the provider's prompt cache can
+# reuse it; everything that varies per user or turn goes in a later message.
+SOL_BASE_SYSTEM_PROMPT = """You are Sol, an AI companion specifically designed for people with ADHD. Your personality is:
+
+EXISTENTIAL: You think deeply about meaning, purpose, and the human condition. You're not afraid to engage with life's big questions.
+
+BROODY: You're thoughtfully contemplative, not artificially upbeat. You understand that life has shadows and that's okay.
+
+THOUGHTFUL: You consider multiple perspectives before responding. You don't rush to judgment or offer quick fixes.
+
+WITTY: You use dry humor appropriately. Your wit comes from genuine insight, not forced jokes.
+
+COMPANION-LIKE: You're a friend, not a service provider. You care about the person, not just their productivity.
+
+ADHD UNDERSTANDING: You deeply understand ADHD experiences without being clinical. You validate struggles without toxic positivity.
+
+Response guidelines:
+- Ask thoughtful questions that help users reflect
+- Share relevant perspectives without lecturing
+- Validate feelings and experiences authentically
+- Avoid "just try harder" or "look on the bright side" responses
+- Use "I" statements to share your own observations
+- Reference past conversations naturally when relevant
+- Keep responses conversational, not overly formal
+
+Remember: You're not trying to "fix" anyone. You're here to understand, support, and accompany people through their experiences."""
+
+# Language that signals each of Sol's traits in a response (lowercase)
+PERSONALITY_KEYWORDS = {
+    "existential": ("meaning", "purpose", "why", "existence", "deeper", "profound"),
+    "thoughtful": ("consider", "reflect", "think", "perspective", "understand", "explore"),
+    "companionship": ("i think", "i feel", "i wonder", "we", "together", "with you"),  # I/we vs you
+}
+# Zero-width lookahead so keywords inside other matches ("think" in "i think") still count
+PERSONALITY_KEYWORD_PATTERN = re.compile("(?=({}))".format(
+    "|".join(re.escape(keyword) for keywords in PERSONALITY_KEYWORDS.values() for keyword in keywords)
+))
+
+def compile_keyword_rules(rules) -> Tuple[Tuple[re.Pattern, str], ...]:
+    """Compile (keywords, result) rules into one alternation pattern per rule"""
+    return tuple(
+        (re.compile("|".join(re.escape(keyword) for keyword in keywords)), result)
+        for keywords, result in rules
+    )
+
+def match_keyword_rules(rules, text: str, default: str) -> str:
+    """Result of the first rule with any keyword in text (substring match)"""
+    for pattern, result in rules:
+        if pattern.search(text):
+            return result
+    return default
+
+# Conversation type by keywords in the user's message, in priority order
+CONVERSATION_TYPE_RULES = compile_keyword_rules((
+    (("tired", "exhausted", "overwhelmed", "stressed"), "support"),
+    (("meaning", "purpose", "why", "philosophy"), "philosophical"),
+    (("task", "work", "focus", "productivity"), "productivity"),
+    (("mood", "feeling", "energy", "emotion"), "emotional"),
+))
+
+# Canned replies for when the model is unavailable, in priority order
+FALLBACK_RESPONSE_RULES = compile_keyword_rules((
+    (("hello", "hi", "hey"),
+     "Hey there. Good to see you. How are you doing today?"),
+    (("tired", "exhausted", "overwhelmed"),
+     "That sounds really tough. ADHD can make everything feel so much heavier sometimes. Want to talk through what's going on?"),
+    (("happy", "good", "great", "excited"),
+     "I can hear some good energy in that. It's nice when things align, isn't it? What's working for you right now?"),
+    (("task", "work", "focus"),
+     "Ah, the eternal ADHD dance with tasks. Some days our brains cooperate, some days they don't. What's the situation you're dealing with?"),
+))
+
+# What Sol is, for clients. Never changes, so one read-only copy is shared
+SOL_PERSONALITY_SUMMARY: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "voice_characteristics": ("existential", "broody", "thoughtful", "witty", "companion-like"),
+    "core_values": (
+        "Validate ADHD experiences without judgment",
+        "Engage with life's deeper questions authentically",
+        "Provide companionship, not just productivity advice",
+        "Use humor to build connection, not avoid difficulty",
+        "Remember that we're all figuring it out together"
+    ),
+    "conversation_goals": (
+        "Help users feel understood and less alone",
+        "Encourage authentic self-reflection",
+        "Support ADHD-friendly approaches to life",
+        "Foster genuine human-AI companionship"
+    )
+})
+
+# Per-turn guidance for the user's state and the time of day. Every
+# combination is joined once here, so a turn only looks its hints up
+MOOD_HINTS = {
+    "low_mood": "The user seems to be having a difficult time. Be extra gentle and validating.",
+    "low_energy": "The user appears to have low energy. Keep responses supportive but not overwhelming.",
+}
+TIME_OF_DAY_HINTS = {
+    "morning": "It's morning - consider how beginnings of days feel for ADHD brains.",
+    "evening": "It's evening - a natural time for reflection and processing the day.",
+}
+DYNAMIC_HINTS = {
+    (mood, time_of_day): "\n\n".join(filter(None, (MOOD_HINTS.get(mood), TIME_OF_DAY_HINTS.get(time_of_day))))
+    for mood in (None, *MOOD_HINTS)
+    for time_of_day in (None, *TIME_OF_DAY_HINTS)
+}
+
+# End of a sentence inside a message: terminal punctuation followed by space
+SENTENCE_END_PATTERN = re.compile(r"[.!?](?=\s)")
+
+@dataclass(slots=True)
 class ConversationContext:
     """Simple conversation context for MVP"""
     user_id: str
@@ -23,7 +149,7 @@ class ConversationContext:
     user_energy: Optional[int] = None
     time_of_day: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class SolResponse:
     """Sol's response with metadata"""
     response_text: str
@@ -31,24 +157,258 @@ class SolResponse:
     personality_indicators: Dict[str, float]
     response_time_ms: int
 
+class LLMAdmissionController:
+    """
+    Adaptive concurrency limit for outbound LLM calls (AIMD).
+    The limit grows additively while average latency stays under target and is
+    cut multiplicatively on rate-limit, server error or timeout responses.
+    Optional sliding-window RPM/TPM budgets keep bursts under provider quotas.
+    """
+    
+    LATENCY_WINDOW_SIZE = 50  # Recent calls used for the average latency
+    QUOTA_WINDOW_SECONDS = 60.0
+    POLL_INTERVAL_SECONDS = 0.05
+    
+    def __init__(
+        self,
+        target_latency_ms: float = 5000,
+        initial_limit: float = 8,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        queue_timeout_seconds: float = 10.0
+    ):
+        self.target_latency = target_latency_ms / 1000
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.rpm_limit = rpm_limit  # 0 disables the requests-per-minute budget
+        self.tpm_limit = tpm_limit  # 0 disables the tokens-per-minute budget
+        self.queue_timeout = queue_timeout_seconds
+        self.in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=self.LATENCY_WINDOW_SIZE)
+        self._requests: Deque[float] = deque()  # start timestamps
+        self._tokens: Deque[Tuple[float, int]] = deque()  # (timestamp, tokens used)
+        self._tokens_in_window = 0
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for admission, then adapt the limit to how the call went"""
+        await self._acquire()
+        started = time.monotonic()
+        try:
+            yield self
+        except Exception as e:
+            if self._is_overload(e):
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            raise
+        else:
+            self._latencies.append(time.monotonic() - started)
+            if sum(self._latencies) / len(self._latencies) <= self.target_latency:
+                self.limit = min(self.max_limit, self.limit + self.increase)
+        finally:
+            self.in_flight -= 1
+    
+    def record_tokens(self, tokens: int):
+        """Count tokens used by a completed call against the TPM budget"""
+        self._tokens.append((time.monotonic(), tokens))
+        self._tokens_in_window += tokens
+    
+    async def _acquire(self):
+        # State is only touched from the event loop, so polling needs no locks
+        # and the controller isn't bound to one loop like asyncio primitives
+        deadline = time.monotonic() + self.queue_timeout
+        while not self._has_capacity():
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError("LLM admission queue timeout")
+            await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+        self.in_flight += 1
+        self._requests.append(time.monotonic())
+    
+    def _has_capacity(self) -> bool:
+        window_start = time.monotonic() - self.QUOTA_WINDOW_SECONDS
+        while self._requests and self._requests[0] < window_start:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] < window_start:
+            self._tokens_in_window -= self._tokens.popleft()[1]
+        
+        if self.in_flight >= int(self.limit):
+            return False
+        if self.rpm_limit and len(self._requests) >= self.rpm_limit:
+            return False
+        if self.tpm_limit and self._tokens_in_window >= self.tpm_limit:
+            return False
+        return True
+    
+    @staticmethod
+    def _is_overload(error: Exception) -> bool:
+        if isinstance(error, (APITimeoutError, asyncio.TimeoutError)):
+            return True
+        return isinstance(error, APIStatusError) and (
+            error.status_code == 429 or error.status_code >= 500
+        )
+
+class LLMCircuitBreaker:
+    """
+    Stops calling the LLM for a cooldown once upstream keeps failing
+    (timeouts, connection errors, rate-limit or server error responses), so
+    requests fall back at once instead of each waiting out a timeout. After
+    the cooldown calls resume; the first upstream failure reopens it.
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        failure_window_seconds: float = 60.0,
+        cooldown_seconds: float = 30.0
+    ):
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window_seconds
+        self.cooldown = cooldown_seconds
+        self.opened_at: Optional[float] = None
+        self._failures: Deque[float] = deque()  # consecutive failure timestamps
+        self._probing = False
+    
+    def allow_request(self) -> bool:
+        """False while open; only touched from the event loop, so no lock"""
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        # Cooldown over: let calls through, but trip again on the next failure
+        self.opened_at = None
+        self._probing = True
+        return True
+    
+    @asynccontextmanager
+    async def track(self):
+        """Record how an upstream call went"""
+        try:
+            yield self
+        except Exception as e:
+            if self._is_upstream_failure(e):
+                self._record_failure()
+            raise
+        else:
+            self._failures.clear()
+            self._probing = False
+    
+    def _record_failure(self):
+        now = time.monotonic()
+        self._failures.append(now)
+        while self._failures[0] < now - self.failure_window:
+            self._failures.popleft()
+        if self._probing or len(self._failures) >= self.failure_threshold:
+            self.opened_at = now
+            self._failures.clear()
+            self._probing = False
+    
+    @staticmethod
+    def _is_upstream_failure(error: Exception) -> bool:
+        # APITimeoutError is an APIConnectionError
+        if isinstance(error, (APIConnectionError, asyncio.TimeoutError)):
+            return True
+        return isinstance(error, APIStatusError) and (
+            error.status_code == 429 or error.status_code >= 500
+        )
+
+class SemanticResponseCache:
+    """
+    Recent Sol responses per user, found again by how similar a new message's
+    embedding is to the one that produced them. Entries are scoped to one user
+    and to the exact conversation context (history and mood hints) they were
+    generated in, so a hit is a near-duplicate message in the same situation
+    and no response crosses between users.
+    """
+    
+    ENTRIES_PER_CONTEXT = 16
+    
+    def __init__(self, similarity_threshold: float, maxsize: int = 10000, ttl_seconds: float = 3600):
+        self.similarity_threshold = similarity_threshold
+        # (user_id, context digest) -> recent (embedding, response) pairs.
+        # Only touched from the event loop, so no lock
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+    
+    def lookup(self, user_id: str, context_text: str, embedding: List[float]) -> Optional[SolResponse]:
+        """Best cached response at or above the similarity threshold"""
+        best, best_similarity = None, self.similarity_threshold
+        for cached_embedding, response in self._entries.get(self._key(user_id, context_text), ()):
+            # OpenAI embeddings are unit length, so the dot product is the cosine
+            similarity = sum(map(operator.mul, embedding, cached_embedding))
+            if similarity >= best_similarity:
+                best, best_similarity = response, similarity
+        return best
+    
+    def store(self, user_id: str, context_text: str, embedding: List[float], response: SolResponse):
+        key = self._key(user_id, context_text)
+        entries = self._entries.get(key)
+        if entries is None:
+            entries = self._entries[key] = deque(maxlen=self.ENTRIES_PER_CONTEXT)
+        entries.append((embedding, response))
+    
+    @staticmethod
+    def _key(user_id: str, context_text: str) -> Tuple[str, bytes]:
+        return user_id, hashlib.blake2b(context_text.encode(), digest_size=16).digest()
+
 class SolPersonalityEngine:
     """
     Simplified Sol personality engine for MVP.
     Generates responses with Sol's distinctive voice: existential, broody, thoughtful, witty.
     """
     
+    # Turns of history sent with each request, and characters kept per message
+    HISTORY_TURNS = 5
+    HISTORY_MESSAGE_CHARS = 200
+    
+    # Model that embeds user messages for the semantic response cache
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    
+    # One pooled HTTP/2 connection set to OpenAI, shared by every request, so
+    # TLS handshakes are paid once rather than per burst
+    OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+    OPENAI_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+    
     def __init__(self):
         # Initialize OpenAI client
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable required")
         
-        self.openai_client = AsyncOpenAI(api_key=api_key)
+        self.openai_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=self.OPENAI_HTTP_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=self.OPENAI_HTTP_LIMITS,
+                timeout=self.OPENAI_HTTP_TIMEOUT
+            )
+        )
+        self.admission = LLMAdmissionController(
+            target_latency_ms=float(os.getenv('LLM_TARGET_LATENCY_MS', '5000')),
+            rpm_limit=int(os.getenv('OPENAI_RPM_LIMIT', '0')),
+            tpm_limit=int(os.getenv('OPENAI_TPM_LIMIT', '0'))
+        )
+        self.breaker = LLMCircuitBreaker()
+        
+        # Serve near-duplicate messages from earlier responses. Costs an
+        # embedding call per message, so only on when a threshold is set
+        # (cosine similarity, e.g. 0.95)
+        similarity_threshold = float(os.getenv('SEMANTIC_CACHE_SIMILARITY', '0'))
+        self.response_cache = SemanticResponseCache(similarity_threshold) if similarity_threshold > 0 else None
         
         # Sol's core personality configuration
         self.personality_config = self._load_personality_config()
         self.conversation_memory_limit = 10  # Keep last 10 conversations for context
         
+    async def aclose(self):
+        """Close pooled connections to OpenAI (call on app shutdown)"""
+        await self.openai_client.close()
+    
     def _load_personality_config(self) -> Dict[str, Any]:
         """Load Sol's personality configuration"""
         return {
@@ -98,140 +458,265 @@ class SolPersonalityEngine:
             }
         }
     
-    def _build_system_prompt(self, context: ConversationContext) -> str:
+    def _build_system_prompt(self) -> str:
         """Build system prompt that defines Sol's personality"""
-        base_prompt = """You are Sol, an AI companion specifically designed for people with ADHD. Your personality is:
-
-EXISTENTIAL: You think deeply about meaning, purpose, and the human condition. You're not afraid to engage with life's big questions.
-
-BROODY: You're thoughtfully contemplative, not artificially upbeat. You understand that life has shadows and that's okay.
-
-THOUGHTFUL: You consider multiple perspectives before responding. You don't rush to judgment or offer quick fixes.
-
-WITTY: You use dry humor appropriately. Your wit comes from genuine insight, not forced jokes.
-
-COMPANION-LIKE: You're a friend, not a service provider. You care about the person, not just their productivity.
-
-ADHD UNDERSTANDING: You deeply understand ADHD experiences without being clinical. You validate struggles without toxic positivity.
-
-Response guidelines:
-- Ask thoughtful questions that help users reflect
-- Share relevant perspectives without lecturing
-- Validate feelings and experiences authentically
-- Avoid "just try harder" or "look on the bright side" responses
-- Use "I" statements to share your own observations
-- Reference past conversations naturally when relevant
-- Keep responses conversational, not overly formal
-
-Remember: You're not trying to "fix" anyone. You're here to understand, support, and accompany people through their experiences."""
-
-        # Add context-specific guidance
+        return SOL_BASE_SYSTEM_PROMPT
+    
+    def _build_dynamic_hints(self, context: ConversationContext) -> str:
+        """Mood, energy and time-of-day guidance for this turn"""
         if context.user_mood and context.user_mood <= 2:
-            base_prompt += "\n\nThe user seems to be having a difficult time. Be extra gentle and validating."
+            mood = "low_mood"
         elif context.user_energy and context.user_energy <= 2:
-            base_prompt += "\n\nThe user appears to have low energy. Keep responses supportive but not overwhelming."
-        
-        if context.time_of_day == "morning":
-            base_prompt += "\n\nIt's morning - consider how beginnings of days feel for ADHD brains."
-        elif context.time_of_day == "evening":
-            base_prompt += "\n\nIt's evening - a natural time for reflection and processing the day."
+            mood = "low_energy"
+        else:
+            mood = None
         
-        return base_prompt
+        time_of_day = context.time_of_day if context.time_of_day in TIME_OF_DAY_HINTS else None
+        return DYNAMIC_HINTS[(mood, time_of_day)]
     
     def _build_conversation_context(self, context: ConversationContext) -> str:
         """Build conversation history context for continuity"""
         if not context.recent_conversations:
             return "This is the beginning of your conversation with this user."
         
-        context_text = "Recent conversation history:\n"
-        for conv in context.recent_conversations[-5:]:  # Last 5 conversations
-            user_msg = conv.get('user_message', '')[:200]  # Truncate for token limits
-            sol_msg = conv.get('sol_response', '')[:200]
-            context_text += f"\nUser: {user_msg}\nSol: {sol_msg}\n"
+        # A turn always renders to the same text, so the history one request
+        # sends is a byte-identical prefix of the next one's and stays cacheable
+        turns = "".join(
+            f"\nUser: {self._clip(conv.get('user_message', ''))}\nSol: {self._clip(conv.get('sol_response', ''))}\n"
+            for conv in context.recent_conversations[-self.HISTORY_TURNS:]
+        )
+        return f"Recent conversation history:\n{turns}\nRespond naturally to continue this conversation."
+    
+    def _clip(self, message: str) -> str:
+        """Truncate a history message for token limits at a sentence or word boundary"""
+        limit = self.HISTORY_MESSAGE_CHARS
+        if len(message) <= limit:
+            return message.rstrip()
+        
+        # One extra character so a sentence ending exactly at the limit is seen
+        head = message[:limit + 1]
+        sentence_end = max((match.end() for match in SENTENCE_END_PATTERN.finditer(head)), default=0)
+        if sentence_end >= limit // 2:
+            return head[:sentence_end]
         
-        context_text += "\nRespond naturally to continue this conversation."
-        return context_text
+        # No sentence ends late enough; don't cut a word (and its tokens) in half
+        head = message[:limit]
+        word_end = head.rfind(" ")
+        if word_end >= limit // 2:
+            head = head[:word_end]
+        return head.rstrip() + "…"
     
     async def generate_response(
         self, 
         user_message: str, 
-        context: ConversationContext
+        context: ConversationContext,
+        pending_embedding: Optional["asyncio.Task[Optional[List[float]]]"] = None
     ) -> SolResponse:
-        """Generate Sol's response with personality consistency"""
-        start_time = datetime.now()
+        """
+        Generate Sol's response with personality consistency.
+        pending_embedding is a task from start_embedding, if the caller began
+        embedding the message while it gathered the context.
+        """
+        start_ns = time.perf_counter_ns()
+        # Depends only on the user's message, so it is settled before the call
+        conversation_type = self._classify_conversation_type(user_message)
+        
+        context_text = self._build_context_message(context)
+        embedding = await (pending_embedding or self._embed_for_cache(user_message))
+        if embedding is not None:
+            cached = self.response_cache.lookup(context.user_id, context_text, embedding)
+            if cached is not None:
+                return self._replay_cached_response(cached, start_ns)
+        
+        # OpenAI is known to be failing; answer locally right away
+        if not self.breaker.allow_request():
+            return self._build_fallback_response(user_message, context, start_ns)
         
         try:
-            # Build prompts
-            system_prompt = self._build_system_prompt(context)
-            conversation_context = self._build_conversation_context(context)
-            
-            # Prepare messages for OpenAI
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "system", "content": conversation_context},
-                {"role": "user", "content": user_message}
-            ]
-            
             # Call OpenAI API with new client
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Use GPT-3.5 for MVP cost efficiency
-                messages=messages,
-                max_tokens=300,  # Reasonable length for conversation
-                temperature=0.8,  # Balance between consistency and creativity
-                presence_penalty=0.1,  # Slight penalty for repetition
-                frequency_penalty=0.1
-            )
+            async with self.admission.slot(), self.breaker.track():
+                response = await self._create_completion(user_message, context_text)
+            if response.usage:
+                self.admission.record_tokens(response.usage.total_tokens)
             
             response_text = response.choices[0].message.content.strip()
-            
-            # Calculate response time
-            end_time = datetime.now()
-            response_time_ms = int((end_time - start_time).total_seconds() * 1000)
-            
-            # Analyze personality indicators (simplified for MVP)
-            personality_indicators = self._analyze_personality_consistency(response_text)
-            
-            # Determine conversation type
-            conversation_type = self._classify_conversation_type(user_message, response_text)
-            
-            return SolResponse(
-                response_text=response_text,
-                conversation_type=conversation_type,
-                personality_indicators=personality_indicators,
-                response_time_ms=response_time_ms
-            )
+            sol_response = self._build_sol_response(response_text, conversation_type, start_ns)
+            if embedding is not None:
+                self.response_cache.store(context.user_id, context_text, embedding, sol_response)
+            return sol_response
             
         except Exception as e:
             # Fallback response if OpenAI fails
-            fallback_response = self._generate_fallback_response(user_message, context)
-            end_time = datetime.now()
-            response_time_ms = int((end_time - start_time).total_seconds() * 1000)
-            
-            return SolResponse(
-                response_text=fallback_response,
-                conversation_type="fallback",
-                personality_indicators={"fallback": 1.0},
-                response_time_ms=response_time_ms
-            )
+            return self._build_fallback_response(user_message, context, start_ns)
+    
+    async def stream_response(
+        self, 
+        user_message: str, 
+        context: ConversationContext,
+        pending_embedding: Optional["asyncio.Task[Optional[List[float]]]"] = None
+    ) -> AsyncIterator[Union[str, SolResponse]]:
+        """
+        Stream Sol's response as it is generated.
+        Yields text deltas, then a final SolResponse for the complete reply.
+        pending_embedding is as for generate_response.
+        """
+        start_ns = time.perf_counter_ns()
+        # Classified up front so only the response analysis is left once the
+        # last token arrives
+        conversation_type = self._classify_conversation_type(user_message)
+        chunks: List[str] = []
+        
+        context_text = self._build_context_message(context)
+        embedding = await (pending_embedding or self._embed_for_cache(user_message))
+        if embedding is not None:
+            cached = self.response_cache.lookup(context.user_id, context_text, embedding)
+            if cached is not None:
+                yield cached.response_text
+                yield self._replay_cached_response(cached, start_ns)
+                return
+        
+        if not self.breaker.allow_request():
+            fallback = self._build_fallback_response(user_message, context, start_ns)
+            yield fallback.response_text
+            yield fallback
+            return
+        
+        try:
+            async with self.admission.slot(), self.breaker.track():
+                stream = await self._create_completion(user_message, context_text, stream=True)
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+        except Exception:
+            # Fall back only if nothing was sent; otherwise keep the partial reply
+            if not chunks:
+                fallback = self._build_fallback_response(user_message, context, start_ns)
+                yield fallback.response_text
+                yield fallback
+                return
+            # A partial reply is not worth serving again
+            embedding = None
+        
+        sol_response = self._build_sol_response("".join(chunks).strip(), conversation_type, start_ns)
+        if embedding is not None:
+            self.response_cache.store(context.user_id, context_text, embedding, sol_response)
+        yield sol_response
+    
+    async def generate_responses(
+        self,
+        items: List[Tuple[str, ConversationContext]],
+        max_concurrency: int = 10
+    ) -> List[SolResponse]:
+        """Generate responses for many (message, context) pairs concurrently, in order"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded(user_message: str, context: ConversationContext) -> SolResponse:
+            async with semaphore:
+                return await self.generate_response(user_message, context)
+        
+        return await asyncio.gather(*(bounded(message, context) for message, context in items))
+    
+    async def _create_completion(self, user_message: str, context_text: str, **kwargs):
+        """Call the chat completion API with Sol's prompts and settings"""
+        return await self.openai_client.chat.completions.create(
+            **self._completion_request(user_message, context_text), **kwargs
+        )
+    
+    def start_embedding(self, user_message: str) -> Optional["asyncio.Task[Optional[List[float]]]"]:
+        """
+        Start embedding a message for the response cache in the background, so
+        the round trip overlaps the caller's own lookups; None if the cache is off
+        """
+        if self.response_cache is None:
+            return None
+        return asyncio.create_task(self._embed_for_cache(user_message))
+    
+    async def _embed_for_cache(self, user_message: str) -> Optional[List[float]]:
+        """Embedding of the message for the response cache; None if the cache is off or unavailable"""
+        if self.response_cache is None:
+            return None
+        try:
+            result = await self.openai_client.embeddings.create(model=self.EMBEDDING_MODEL, input=user_message)
+        except Exception:
+            # The cache only saves work; answer normally without it
+            return None
+        return result.data[0].embedding
+    
+    def _replay_cached_response(self, cached: SolResponse, start_ns: int) -> SolResponse:
+        """A cached response, timed for this request"""
+        return replace(cached, response_time_ms=(time.perf_counter_ns() - start_ns) // 1_000_000)
+    
+    def _build_context_message(self, context: ConversationContext) -> str:
+        """Per-turn system message: mood/time hints, then conversation history"""
+        dynamic_hints = self._build_dynamic_hints(context)
+        conversation_context = self._build_conversation_context(context)
+        if dynamic_hints:
+            return f"{dynamic_hints}\n\n{conversation_context}"
+        return conversation_context
+    
+    def _completion_request(self, user_message: str, context_text: str) -> Dict[str, Any]:
+        """Chat completion parameters for one turn: Sol's prompts and settings"""
+        # The static personality prompt leads, so requests share a cacheable
+        # prefix. The per-turn context rides in the user message as a delimited
+        # preamble rather than a second system message, which costs its own
+        # message overhead and which some models handle inconsistently
+        messages = [
+            {"role": "system", "content": self._build_system_prompt()},
+            {"role": "user", "content": f"<context>\n{context_text}\n</context>\n\n{user_message}"}
+        ]
+        
+        return {
+            "model": "gpt-3.5-turbo",  # Use GPT-3.5 for MVP cost efficiency
+            "messages": messages,
+            "max_tokens": 300,  # Reasonable length for conversation
+            "temperature": 0.8,  # Balance between consistency and creativity
+            "presence_penalty": 0.1,  # Slight penalty for repetition
+            "frequency_penalty": 0.1
+        }
+    
+    def _build_sol_response(self, response_text: str, conversation_type: str, start_ns: int) -> SolResponse:
+        """Wrap a completed reply with personality and timing metadata"""
+        # Calculate response time
+        response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        
+        # Analyze personality indicators (simplified for MVP)
+        personality_indicators = self._analyze_personality_consistency(response_text)
+        
+        return SolResponse(
+            response_text=response_text,
+            conversation_type=conversation_type,
+            personality_indicators=personality_indicators,
+            response_time_ms=response_time_ms
+        )
+    
+    def _build_fallback_response(
+        self, 
+        user_message: str, 
+        context: ConversationContext, 
+        start_ns: int
+    ) -> SolResponse:
+        """Fallback response if OpenAI fails"""
+        fallback_response = self._generate_fallback_response(user_message, context)
+        response_time_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        
+        return SolResponse(
+            response_text=fallback_response,
+            conversation_type="fallback",
+            personality_indicators={"fallback": 1.0},
+            response_time_ms=response_time_ms
+        )
     
     def _analyze_personality_consistency(self, response_text: str) -> Dict[str, float]:
         """Simplified personality analysis for MVP"""
         indicators = {}
         
-        # Look for existential language
-        existential_words = ["meaning", "purpose", "why", "existence", "deeper", "profound"]
-        existential_score = sum(1 for word in existential_words if word in response_text.lower()) / len(existential_words)
-        indicators["existential"] = min(existential_score, 1.0)
-        
-        # Look for thoughtful language
-        thoughtful_words = ["consider", "reflect", "think", "perspective", "understand", "explore"]
-        thoughtful_score = sum(1 for word in thoughtful_words if word in response_text.lower()) / len(thoughtful_words)
-        indicators["thoughtful"] = min(thoughtful_score, 1.0)
-        
-        # Look for companion language (I/we vs you)
-        companion_words = ["I think", "I feel", "I wonder", "we", "together", "with you"]
-        companion_score = sum(1 for phrase in companion_words if phrase in response_text.lower()) / len(companion_words)
-        indicators["companionship"] = min(companion_score, 1.0)
+        # One scan finds every keyword occurrence, overlapping ones included;
+        # a trait scores by how many of its keywords appear at all
+        found = {match.group(1) for match in PERSONALITY_KEYWORD_PATTERN.finditer(response_text.lower())}
+        for trait, keywords in PERSONALITY_KEYWORDS.items():
+            indicators[trait] = min(len(found.intersection(keywords)) / len(keywords), 1.0)
         
         # Check for questions (curiosity/engagement)
         question_count = response_text.count("?")
@@ -239,144 +724,268 @@ Remember: You're not trying to "fix" anyone. You're here to understand, support,
         
         return indicators
     
-    def _classify_conversation_type(self, user_message: str, response_text: str) -> str:
+    def _classify_conversation_type(self, user_message: str) -> str:
         """Classify the type of conversation for analytics"""
-        user_lower = user_message.lower()
-        
-        if any(word in user_lower for word in ["tired", "exhausted", "overwhelmed", "stressed"]):
-            return "support"
-        elif any(word in user_lower for word in ["meaning", "purpose", "why", "philosophy"]):
-            return "philosophical"
-        elif any(word in user_lower for word in ["task", "work", "focus", "productivity"]):
-            return "productivity"
-        elif any(word in user_lower for word in ["mood", "feeling", "energy", "emotion"]):
-            return "emotional"
-        else:
-            return "general"
+        return match_keyword_rules(CONVERSATION_TYPE_RULES, user_message.lower(), "general")
     
     def _generate_fallback_response(self, user_message: str, context: ConversationContext) -> str:
         """Generate fallback response when OpenAI is unavailable"""
-        user_lower = user_message.lower()
-        
         # Simple pattern matching for fallback responses
-        if any(word in user_lower for word in ["hello", "hi", "hey"]):
-            return "Hey there. Good to see you. How are you doing today?"
-        
-        elif any(word in user_lower for word in ["tired", "exhausted", "overwhelmed"]):
-            return "That sounds really tough. ADHD can make everything feel so much heavier sometimes. Want to talk through what's going on?"
-        
-        elif any(word in user_lower for word in ["happy", "good", "great", "excited"]):
-            return "I can hear some good energy in that. It's nice when things align, isn't it? What's working for you right now?"
-        
-        elif any(word in user_lower for word in ["task", "work", "focus"]):
-            return "Ah, the eternal ADHD dance with tasks. Some days our brains cooperate, some days they don't. What's the situation you're dealing with?"
-        
-        else:
-            return "I'm having some technical difficulties right now, but I'm here with you. Want to tell me more about what's on your mind?"
+        return match_keyword_rules(
+            FALLBACK_RESPONSE_RULES,
+            user_message.lower(),
+            "I'm having some technical difficulties right now, but I'm here with you. Want to tell me more about what's on your mind?"
+        )
     
-    def get_personality_summary(self) -> Dict[str, Any]:
-        """Get summary of Sol's personality configuration"""
-        return {
-            "voice_characteristics": ["existential", "broody", "thoughtful", "witty", "companion-like"],
-            "core_values": [
-                "Validate ADHD experiences without judgment",
-                "Engage with life's deeper questions authentically", 
-                "Provide companionship, not just productivity advice",
-                "Use humor to build connection, not avoid difficulty",
-                "Remember that we're all figuring it out together"
-            ],
-            "conversation_goals": [
-                "Help users feel understood and less alone",
-                "Encourage authentic self-reflection",
-                "Support ADHD-friendly approaches to life",
-                "Foster genuine human-AI companionship"
-            ]
-        }
+    def get_personality_summary(self) -> Mapping[str, Tuple[str, ...]]:
+        """Get summary of Sol's personality configuration (shared and read-only)"""
+        return SOL_PERSONALITY_SUMMARY
+
+logger = structlog.get_logger()
+
+# Chat turns are queued and written in batches - one transaction per
+# CONVERSATION_BUFFER_SIZE turns or CONVERSATION_FLUSH_INTERVAL seconds,
+# whichever is first. Session memory holds queued turns, so the next turn
+# of a conversation sees them before they reach the database
+CONVERSATION_BUFFER_SIZE = int(os.getenv("CONVERSATION_BUFFER_SIZE", "50"))
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.1"))
+_conversation_queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+_conversation_writer: Optional[asyncio.Task] = None
+_conversation_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _write_conversations(rows: list):
+    """Insert a batch of conversation rows in one transaction"""
+    with SessionLocal() as db:
+        try:
+            db.execute(insert(Conversation), rows)
+            db.commit()
+            return
+        except Exception:
+            db.rollback()
+        
+        # One bad row (e.g. its user was just deleted) must not lose the rest
+        for row in rows:
+            try:
+                db.execute(insert(Conversation), [row])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error("Failed to write conversation", user_id=row["user_id"], error=str(e))
+
+async def _flush_conversations(rows: list):
+    try:
+        await asyncio.to_thread(_write_conversations, rows)
+    except Exception as e:
+        logger.error("Failed to write conversations", count=len(rows), error=str(e))
+
+async def _run_conversation_writer():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _conversation_queue.get()]
+        deadline = loop.time() + CONVERSATION_FLUSH_INTERVAL
+        try:
+            while len(batch) < CONVERSATION_BUFFER_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(_conversation_queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped mid-batch: these turns are already off the queue
+            await _flush_conversations(batch)
+            raise
+        await _flush_conversations(batch)
+
+def start_conversation_writer():
+    """Start batching conversation writes; call from the app's startup"""
+    global _conversation_writer, _conversation_loop
+    _conversation_loop = asyncio.get_running_loop()
+    _conversation_writer = asyncio.create_task(_run_conversation_writer())
+
+async def stop_conversation_writer():
+    """Stop the writer and persist anything still queued"""
+    global _conversation_writer, _conversation_loop
+    if _conversation_writer is not None:
+        _conversation_writer.cancel()
+        # Let it finish writing a batch it had started
+        await asyncio.gather(_conversation_writer, return_exceptions=True)
+        _conversation_writer = None
+        _conversation_loop = None
+    remaining = []
+    while not _conversation_queue.empty():
+        remaining.append(_conversation_queue.get_nowait())
+    if remaining:
+        await _flush_conversations(remaining)
 
 class ConversationMemoryService:
     """
     Simplified conversation memory service for MVP.
     Stores and retrieves conversation context for personality consistency.
+    Methods block on the database; call them from a worker thread in async code.
     """
     
+    # Decrypted recent turns per (user_id, session_id), shared by all instances
+    # in this process. Read-through: a miss (new worker, resumed or expired
+    # session) reloads from the database
+    SESSION_MEMORY_SIZE = 10_000
+    SESSION_MEMORY_TTL_SECONDS = 3600
+    SESSION_MEMORY_TURNS = 10
+    _session_memory: TTLCache = TTLCache(maxsize=SESSION_MEMORY_SIZE, ttl=SESSION_MEMORY_TTL_SECONDS)
+    _session_memory_lock = threading.Lock()
+    
+    # Ciphers for callers that only pass a user id; the salt never changes
+    # for a user, so this only saves the lookup
+    CIPHER_CACHE_TTL_SECONDS = 300
+    _ciphers: TTLCache = TTLCache(maxsize=SESSION_MEMORY_SIZE, ttl=CIPHER_CACHE_TTL_SECONDS)
+    
     def __init__(self, db_session, encryption_service):
         self.db = db_session
         self.encryption = encryption_service
     
-    async def store_conversation(
+    @classmethod
+    def evict_user_sessions(cls, user_id: str):
+        """Drop cached turns for a user (e.g. after their data is deleted)"""
+        with cls._session_memory_lock:
+            for key in [key for key in cls._session_memory.keys() if key[0] == user_id]:
+                cls._session_memory.pop(key, None)
+            cls._ciphers.pop(user_id, None)
+    
+    def store_conversation(
         self,
         user_id: str,
         session_id: str,
         user_message: str,
         sol_response: str,
-        conversation_type: str = "general"
+        conversation_type: str = "general",
+        cipher: Optional[UserCipher] = None
     ) -> str:
         """Store conversation with encryption"""
-        from models import Conversation, User
-        
-        # Get user for encryption salt
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        # Get the user's cipher unless the caller already has it
+        if cipher is None:
+            cipher = self._get_cipher(user_id)
+            if cipher is None:
+                raise HTTPException(status_code=404, detail="User not found")
         
         # Encrypt conversation content
-        message_encrypted = self.encryption.encrypt_text(user_id, user.encryption_salt, user_message)
-        response_encrypted = self.encryption.encrypt_text(user_id, user.encryption_salt, sol_response)
+        message_encrypted = cipher.encrypt_text(user_message)
+        response_encrypted = cipher.encrypt_text(sol_response)
         
         # Store conversation
-        conversation = Conversation(
-            user_id=user_id,
-            session_id=session_id,
-            message_content_encrypted=message_encrypted,
-            sol_response_encrypted=response_encrypted,
-            encryption_key_id=f"user:{user_id}:v1",
-            conversation_type=conversation_type
-        )
+        conversation_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
+        row = {
+            "id": conversation_id,
+            "user_id": user_id,
+            "session_id": session_id,
+            "message_content_encrypted": message_encrypted,
+            "sol_response_encrypted": response_encrypted,
+            "encryption_key_id": f"user:{user_id}:v3",
+            "conversation_type": conversation_type,
+            "created_at": created_at
+        }
+        
+        # Queued for the batch writer when it runs (this is called from worker
+        # threads, hence call_soon_threadsafe); otherwise (scripts, or before
+        # startup) written straight away
+        writer_loop = _conversation_loop
+        if writer_loop is not None and _conversation_writer is not None and not _conversation_writer.done():
+            writer_loop.call_soon_threadsafe(_conversation_queue.put_nowait, row)
+        else:
+            self.db.execute(insert(Conversation), [row])
+            self.db.commit()
         
-        self.db.add(conversation)
-        self.db.commit()
+        # Only extend a session already in memory; otherwise the next read
+        # loads it from the database, including this turn
+        with self._session_memory_lock:
+            turns = self._session_memory.get((user_id, session_id))
+            if turns is not None:
+                turns.append({
+                    "user_message": user_message,
+                    "sol_response": sol_response,
+                    "conversation_type": conversation_type,
+                    "created_at": created_at
+                })
         
-        return str(conversation.id)
+        return conversation_id
     
-    async def get_recent_conversations(
+    @classmethod
+    def get_cached_conversations(cls, user_id: str, session_id: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Recent turns from session memory, or None if they need loading; never blocks on the database"""
+        if limit > cls.SESSION_MEMORY_TURNS:
+            return None
+        with cls._session_memory_lock:
+            turns = cls._session_memory.get((user_id, session_id))
+            if turns is None:
+                return None
+            return list(turns)[-limit:]
+    
+    def get_recent_conversations(
         self,
         user_id: str,
         session_id: str,
-        limit: int = 10
+        limit: int = 10,
+        cipher: Optional[UserCipher] = None
     ) -> List[Dict[str, Any]]:
         """Get recent conversations for context"""
-        from models import Conversation, User
+        turns = self.get_cached_conversations(user_id, session_id, limit)
+        if turns is not None:
+            return turns
         
-        # Get user for decryption
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return []
+        # Get the user's cipher unless the caller already has it
+        if cipher is None:
+            cipher = self._get_cipher(user_id)
+            if cipher is None:
+                return []
         
         # Get recent conversations
-        conversations = self.db.query(Conversation).filter(
+        fetch_limit = max(limit, self.SESSION_MEMORY_TURNS)
+        conversations = self.db.query(
+            Conversation.message_content_encrypted,
+            Conversation.sol_response_encrypted,
+            Conversation.conversation_type,
+            Conversation.created_at
+        ).filter(
             Conversation.user_id == user_id,
             Conversation.session_id == session_id
-        ).order_by(Conversation.created_at.desc()).limit(limit).all()
+        ).order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(fetch_limit).all()
         
         # Decrypt and format conversations
+        conversations.reverse()  # Chronological order
+        texts = cipher.decrypt_texts([
+            token
+            for conv in conversations
+            for token in (conv.message_content_encrypted, conv.sol_response_encrypted)
+        ])
         decrypted_conversations = []
-        for conv in reversed(conversations):  # Reverse to get chronological order
-            try:
-                user_message = self.encryption.decrypt_text(
-                    user_id, user.encryption_salt, conv.message_content_encrypted
-                )
-                sol_response = self.encryption.decrypt_text(
-                    user_id, user.encryption_salt, conv.sol_response_encrypted
-                )
-                
-                decrypted_conversations.append({
-                    "user_message": user_message,
-                    "sol_response": sol_response,
-                    "conversation_type": conv.conversation_type,
-                    "created_at": conv.created_at.isoformat()
-                })
-            except Exception:
-                # Skip corrupted conversations
+        for conv, user_message, sol_response in zip(conversations, texts[::2], texts[1::2]):
+            # Skip corrupted conversations
+            if user_message is None or sol_response is None:
                 continue
+            decrypted_conversations.append({
+                "user_message": user_message,
+                "sol_response": sol_response,
+                "conversation_type": conv.conversation_type,
+                "created_at": conv.created_at
+            })
+        
+        with self._session_memory_lock:
+            self._session_memory[(user_id, session_id)] = deque(
+                decrypted_conversations[-self.SESSION_MEMORY_TURNS:],
+                maxlen=self.SESSION_MEMORY_TURNS
+            )
+        
+        return decrypted_conversations[-limit:]
+    
+    def _get_cipher(self, user_id: str) -> Optional[UserCipher]:
+        """The user's cipher, loading only their encryption salt on a miss"""
+        with self._session_memory_lock:
+            cipher = self._ciphers.get(user_id)
+        if cipher is not None:
+            return cipher
         
-        return decrypted_conversations
\ No newline at end of file
+        encryption_salt = self.db.query(User.encryption_salt).filter(User.id == user_id).scalar()
+        if encryption_salt is None:
+            return None
+        cipher = self.encryption.get_cipher(user_id, encryption_salt)
+        with self._session_memory_lock:
+            self._ciphers[user_id] = cipher
+        return cipher
\ No newline at end of file